@@ -30,23 +30,24 @@ def generate_gpx(route_data: dict, wind_data: dict) -> str:
     dist = route_data["actual_distance_km"]
     junctions_str = " → ".join(route_data["junctions"])
 
-    gpx = f"""<?xml version="1.0" encoding="UTF-8"?>
+    # Parts collected in a list and joined once: repeated += on a growing
+    # string copies the whole document per trackpoint
+    parts = [f"""<?xml version="1.0" encoding="UTF-8"?>
 <gpx version="1.1" creator="RGWND" xmlns="http://www.topografix.com/GPX/1/1">
   <metadata>
     <name>{addr} — {dist} km</name>
     <desc>{wind_label}: {wind_kmh} km/h {wind_dir}. Knooppunten: {junctions_str}{planned_note}</desc>
     <time>{now}</time>
   </metadata>
-"""
+"""]
 
     for jc in route_data["junction_coords"]:
         ref = escape(str(jc["ref"]))
-        gpx += f'  <wpt lat="{jc["lat"]}" lon="{jc["lon"]}"><name>Knooppunt {ref}</name></wpt>\n'
+        parts.append(f'  <wpt lat="{jc["lat"]}" lon="{jc["lon"]}"><name>Knooppunt {ref}</name></wpt>\n')
 
-    gpx += f"  <trk>\n    <name>{addr}</name>\n    <trkseg>\n"
+    parts.append(f"  <trk>\n    <name>{addr}</name>\n    <trkseg>\n")
     for segment in route_data["route_geometry"]:
-        for lat, lon in segment:
-            gpx += f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n'
-    gpx += "    </trkseg>\n  </trk>\n</gpx>"
+        parts.extend(f'      <trkpt lat="{lat}" lon="{lon}"></trkpt>\n' for lat, lon in segment)
+    parts.append("    </trkseg>\n  </trk>\n</gpx>")
 
-    return gpx
+    return "".join(parts)
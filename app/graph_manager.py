@@ -5,8 +5,10 @@ Laadt de knooppuntgraph (pickle) in geheugen en opent SQLite voor lookups.
 Thread-safe: read-only SQLite met per-thread connections, shared K in memory.
 """
 
+import gc
 import json
 import logging
+import math
 import os
 import pickle
 import sqlite3
@@ -15,14 +17,21 @@ from pathlib import Path
 from typing import Optional
 
 import networkx as nx
+import numpy as np
 
-from .overpass import _haversine
+from .overpass import _haversine_np, _haversine_term_np, _node_arrays
 
 logger = logging.getLogger(__name__)
 
 GRAPH_DIR = Path(os.environ.get("GRAPH_DATA_DIR", "./graph_data"))
 
 
+def _nearest_row(lat: float, lon: float, rows: list[tuple[int, float, float]]) -> int:
+    """Id van de (id, lat, lon)-rij het dichtst bij (lat, lon), in één numpy-pass."""
+    ids, lats, lons = zip(*rows)
+    return ids[int(np.argmin(_haversine_term_np(lat, lon, np.array(lats), np.array(lons))))]
+
+
 class GraphManager:
     """Singleton die de pre-built graph data beheert."""
 
@@ -31,6 +40,10 @@ class GraphManager:
 
     def __init__(self):
         self._K: Optional[nx.Graph] = None
+        # Knooppunt-ids + coords als arrays (bij load, gesorteerd op lat), voor gevectoriseerde radius-filter
+        self._kp_ids: Optional[np.ndarray] = None
+        self._kp_lats: Optional[np.ndarray] = None
+        self._kp_lons: Optional[np.ndarray] = None
         self._metadata: Optional[dict] = None
         self._loaded = False
         self._local = threading.local()  # Per-thread SQLite connections
@@ -62,9 +75,26 @@ class GraphManager:
             return False
 
         try:
-            # Laad knooppuntgraph in geheugen
-            with open(pickle_path, "rb") as f:
-                self._K = pickle.load(f)
+            # Laad knooppuntgraph in geheugen. Cyclische GC uit tijdens het
+            # unpicklen: die zou anders telkens opnieuw de miljoenen net
+            # aangemaakte (acyclische) dicts/tuples doorlopen.
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                with open(pickle_path, "rb") as f:
+                    self._K = pickle.load(f)
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+            # Graph leeft zolang het proces: uit de GC-generaties halen zodat
+            # latere collections hem niet telkens mee scannen
+            gc.freeze()
+            # Gesorteerd op latitude: radius-queries knippen eerst met
+            # searchsorted de breedteband eruit (bbox-prefilter)
+            ids, lats, lons = _node_arrays(self._K)
+            order = np.argsort(lats, kind="stable")
+            self._kp_ids = np.array(ids, dtype=np.int64)[order]
+            self._kp_lats, self._kp_lons = lats[order], lons[order]
             logger.info("Knooppuntgraph geladen: %d nodes, %d edges (%.1f MB)",
                         self._K.number_of_nodes(), self._K.number_of_edges(),
                         pickle_path.stat().st_size / 1024 / 1024)
@@ -86,6 +116,7 @@ class GraphManager:
         except Exception as e:
             logger.error("Fout bij laden graph data: %s — fallback naar Overpass", e)
             self._K = None
+            self._kp_ids, self._kp_lats, self._kp_lons = None, None, None
             self._metadata = None
             self._loaded = False
             return False
@@ -101,6 +132,11 @@ class GraphManager:
             )
             self._local.conn.execute("PRAGMA journal_mode=WAL")
             self._local.conn.execute("PRAGMA query_only=ON")
+            # Read-only: database memory-mappen (pagina's via de OS page cache
+            # i.p.v. read()-syscalls) en een ruimere page cache dan de 2 MB default
+            self._local.conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn.execute("PRAGMA cache_size=-32768")
+            self._local.conn.execute("PRAGMA temp_store=MEMORY")
         return self._local.conn
 
     def get_knooppunt_graph(self) -> Optional[nx.Graph]:
@@ -109,25 +145,42 @@ class GraphManager:
             return None
         return self._K.copy()
 
-    def get_knooppunt_subgraph(self, lat: float, lon: float, radius_m: float) -> Optional[nx.Graph]:
+    def get_knooppunt_subgraph(self, lat: float, lon: float, radius_m: float,
+                               start_kp: Optional[int] = None) -> Optional[nx.Graph]:
         """
         Retourneer een subgraph van knooppunten binnen radius van (lat, lon).
         Mutable kopie — veilig om wind effort aan toe te voegen.
+        Met start_kp wordt enkel de samenhangende component van dat knooppunt
+        gekopieerd (bepaald op de view, vóór de kopie).
         """
         if self._K is None:
             return None
 
-        # Filter nodes binnen radius
-        nodes_in_range = []
-        for n, data in self._K.nodes(data=True):
-            d = _haversine(lat, lon, data["y"], data["x"])
-            if d <= radius_m:
-                nodes_in_range.append(n)
+        # Prefilter op breedteband (arrays zijn gesorteerd op lat), dan de
+        # exacte haversine enkel over die bbox i.p.v. over heel België.
+        # 1° lat ≥ 111 km, dus de band bevat zeker alle nodes binnen radius.
+        delta_lat = radius_m / 111_000
+        lo = int(np.searchsorted(self._kp_lats, lat - delta_lat, side="left"))
+        hi = int(np.searchsorted(self._kp_lats, lat + delta_lat, side="right"))
+        # Binnen de band nog een lon-venster (bbox). Haversine-term
+        # a ≥ cos²(φmax)·sin²(Δλ/2), met φmax de grootste |lat| in de band:
+        # voorbij delta_lon ligt een node dus zeker verder dan radius_m.
+        cos_max = math.cos(math.radians(min(90.0, abs(lat) + delta_lat)))
+        sin_half = math.sin(radius_m / (2 * 6_371_000))
+        delta_lon = 180.0 if sin_half >= cos_max else math.degrees(2 * math.asin(sin_half / cos_max))
+        band_lons = self._kp_lons[lo:hi]
+        in_box = np.flatnonzero(np.abs(band_lons - lon) <= delta_lon)
+        dists = _haversine_np(lat, lon, self._kp_lats[lo:hi][in_box], band_lons[in_box])
+        nodes_in_range = self._kp_ids[lo:hi][in_box[dists <= radius_m]].tolist()
 
         if len(nodes_in_range) < 3:
             return None
 
-        return self._K.subgraph(nodes_in_range).copy()
+        view = self._K.subgraph(nodes_in_range)
+        if start_kp is not None and start_kp in view:
+            # Losse eilanden niet eerst kopiëren om ze daarna weer te verwijderen
+            view = self._K.subgraph(nx.node_connected_component(view, start_kp))
+        return view.copy()
 
     def nearest_node(self, lat: float, lon: float) -> Optional[int]:
         """Vind dichtstbijzijnde node via R-tree spatial query op SQLite."""
@@ -142,26 +195,26 @@ class GraphManager:
             """, (lat - delta, lat + delta, lon - delta, lon + delta)).fetchall()
 
             if rows:
-                best = min(rows, key=lambda r: _haversine(lat, lon, r[1], r[2]))
-                return best[0]
+                return _nearest_row(lat, lon, rows)
 
         return None
 
     def nearest_knooppunt(self, lat: float, lon: float) -> Optional[int]:
-        """Vind dichtstbijzijnde knooppunt (node met rcn_ref) via R-tree."""
-        conn = self._get_db()
+        """
+        Vind dichtstbijzijnde knooppunt (node met rcn_ref). Alle knooppunten
+        zitten al in de in-memory arrays (zelfde vensters als de R-tree-query
+        op nodes): breedteband via searchsorted, dan lon-venster + haversine.
+        """
+        if self._kp_lats is None:
+            return None
         for delta in [0.01, 0.05, 0.1, 0.5]:
-            rows = conn.execute("""
-                SELECT n.id, n.lat, n.lon FROM nodes n
-                JOIN nodes_rtree r ON n.id = r.id
-                WHERE r.min_lat >= ? AND r.max_lat <= ?
-                  AND r.min_lon >= ? AND r.max_lon <= ?
-                  AND n.rcn_ref IS NOT NULL
-            """, (lat - delta, lat + delta, lon - delta, lon + delta)).fetchall()
-
-            if rows:
-                best = min(rows, key=lambda r: _haversine(lat, lon, r[1], r[2]))
-                return best[0]
+            lo = int(np.searchsorted(self._kp_lats, lat - delta, side="left"))
+            hi = int(np.searchsorted(self._kp_lats, lat + delta, side="right"))
+            lons = self._kp_lons[lo:hi]
+            in_window = np.flatnonzero(np.abs(lons - lon) <= delta)
+            if len(in_window):
+                dists = _haversine_term_np(lat, lon, self._kp_lats[lo:hi][in_window], lons[in_window])
+                return int(self._kp_ids[lo + in_window[np.argmin(dists)]])
 
         return None
 
@@ -170,21 +223,15 @@ class GraphManager:
         if not node_ids:
             return {}
 
+        # Alle ids als één JSON-array parameter: één query, ongeacht het
+        # aantal ids (geen batches rond de 999-parameterlimiet). SQLite doet
+        # per waarde uit json_each een primary-key lookup.
         conn = self._get_db()
-        result = {}
-        # SQLite parameter limiet is 999 — batch in groepen
-        batch_size = 900
-        for i in range(0, len(node_ids), batch_size):
-            batch = node_ids[i:i + batch_size]
-            placeholders = ",".join("?" * len(batch))
-            rows = conn.execute(
-                f"SELECT id, lat, lon FROM nodes WHERE id IN ({placeholders})",
-                batch,
-            ).fetchall()
-            for nid, lat, lon in rows:
-                result[nid] = (lat, lon)
-
-        return result
+        rows = conn.execute(
+            "SELECT id, lat, lon FROM nodes WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(node_ids),),
+        )
+        return {nid: (lat, lon) for nid, lat, lon in rows}
 
     def build_approach_subgraph(self, lat: float, lon: float, radius_m: float = 5000) -> Optional[nx.MultiDiGraph]:
         """
@@ -194,41 +241,46 @@ class GraphManager:
         conn = self._get_db()
         # Bereken lat/lon delta voor radius (grove benadering)
         delta_lat = radius_m / 111_000
-        delta_lon = radius_m / (111_000 * abs(max(0.1, __import__("math").cos(__import__("math").radians(lat)))))
+        delta_lon = radius_m / (111_000 * abs(max(0.1, math.cos(math.radians(lat)))))
+
+        bbox = (lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon)
 
-        # Haal nodes op
+        # Haal nodes op. De cursor wordt rechtstreeks in de graph gestreamd
+        # (geen fetchall-lijst van alle rijen als tussenstap).
         nodes = conn.execute("""
             SELECT n.id, n.lat, n.lon, n.rcn_ref FROM nodes n
             JOIN nodes_rtree r ON n.id = r.id
             WHERE r.min_lat >= ? AND r.max_lat <= ?
               AND r.min_lon >= ? AND r.max_lon <= ?
-        """, (lat - delta_lat, lat + delta_lat, lon - delta_lon, lon + delta_lon)).fetchall()
+        """, bbox)
 
-        if not nodes:
-            return None
+        # Bulk add i.p.v. add_node per rij (geen kwargs-dict + update per node)
+        G = nx.MultiDiGraph()
+        G.add_nodes_from(
+            (nid, {"y": nlat, "x": nlon, "rcn_ref": rcn_ref} if rcn_ref else {"y": nlat, "x": nlon})
+            for nid, nlat, nlon, rcn_ref in nodes
+        )
 
-        node_ids = {n[0] for n in nodes}
+        if G.number_of_nodes() == 0:
+            return None
 
-        G = nx.MultiDiGraph()
-        for nid, nlat, nlon, rcn_ref in nodes:
-            attrs = {"y": nlat, "x": nlon}
-            if rcn_ref:
-                attrs["rcn_ref"] = rcn_ref
-            G.add_node(nid, **attrs)
-
-        # Haal edges op waar beide endpoints in de node set zitten
-        node_list = list(node_ids)
-        batch_size = 900
-        for i in range(0, len(node_list), batch_size):
-            batch = node_list[i:i + batch_size]
-            placeholders = ",".join("?" * len(batch))
-            edges = conn.execute(
-                f"""SELECT source_id, target_id, length, bearing FROM edges
-                    WHERE source_id IN ({placeholders})""",
-                batch,
-            ).fetchall()
-            for src, tgt, length, bearing in edges:
-                if tgt in node_ids:
-                    G.add_edge(src, tgt, length=length, bearing=bearing)
+        # Edges waar beide endpoints in dezelfde bbox liggen, in één query:
+        # SQLite zoekt per source_id via de index en test target_id tegen de
+        # gematerialiseerde box, i.p.v. ids in batches heen en weer te sturen
+        # en target_id in Python te filteren. De unaire + op target_id houdt
+        # de planner weg van een (source × target) kruisproduct-lookup.
+        edges = conn.execute("""
+            WITH box(id) AS (
+                SELECT id FROM nodes_rtree
+                WHERE min_lat >= ? AND max_lat <= ?
+                  AND min_lon >= ? AND max_lon <= ?
+            )
+            SELECT source_id, target_id, length, bearing FROM edges
+            WHERE source_id IN box AND +target_id IN box
+        """, bbox)
+        G.add_edges_from(
+            (src, tgt, {"length": length, "bearing": bearing})
+            for src, tgt, length, bearing in edges
+        )
 
         return G
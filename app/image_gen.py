@@ -15,6 +15,8 @@ _HEADER_H = 72
 _STATS_H = 128
 _MAP_H = 720
 _JUNC_H = 100
+_DOT_RADIUS = 6
+_DOT_LINE_WIDTH = 2
 
 
 def _hex_to_rgb(hex_color: str) -> tuple[float, float, float]:
@@ -172,24 +174,44 @@ def generate_image(route_data: dict, wind_data: dict) -> bytes:
         ctx.set_line_join(cairo.LINE_JOIN_ROUND)
         ctx.set_line_cap(cairo.LINE_CAP_ROUND)
 
+        # Eén path per segment; punten die op (bijna) dezelfde pixel vallen
+        # als het vorige getekende punt worden overgeslagen — een lange route
+        # heeft duizenden way-nodes maar de schets maar ~1000 px breedte
         for segment in route_data["route_geometry"]:
             if len(segment) < 2:
                 continue
-            ctx.move_to(to_x(segment[0][1]), to_y(segment[0][0]))
+            px, py = to_x(segment[0][1]), to_y(segment[0][0])
+            ctx.move_to(px, py)
+            x, y = px, py
             for lat, lon in segment[1:]:
-                ctx.line_to(to_x(lon), to_y(lat))
+                x, y = to_x(lon), to_y(lat)
+                if abs(x - px) < 0.5 and abs(y - py) < 0.5:
+                    continue
+                ctx.line_to(x, y)
+                px, py = x, y
+            if (x, y) != (px, py):
+                ctx.line_to(x, y)  # eindpunt altijd exact
             ctx.stroke()
 
-        # Junction dots
-        for jc in route_data["junction_coords"]:
-            cx = to_x(jc["lon"])
-            cy = to_y(jc["lat"])
+        # Junction dots: alle cirkels als subpaths van één path, zodat vulling
+        # en rand elk in één fill/stroke gaan i.p.v. twee per knooppunt.
+        # Overlappen twee dots (incl. rand), dan per dot tekenen: anders schijnt
+        # de rand van de onderste door de vulling van de bovenste heen
+        dots = [(to_x(jc["lon"]), to_y(jc["lat"])) for jc in route_data["junction_coords"]]
+        min_dist = 2 * _DOT_RADIUS + _DOT_LINE_WIDTH
+        overlap = any(
+            math.hypot(ax - bx, ay - by) < min_dist
+            for i, (ax, ay) in enumerate(dots)
+            for bx, by in dots[i + 1:]
+        )
+        ctx.set_line_width(_DOT_LINE_WIDTH)
+        for group in ([[d] for d in dots] if overlap else [dots]):
+            for cx, cy in group:
+                ctx.new_sub_path()
+                ctx.arc(cx, cy, _DOT_RADIUS, 0, math.pi * 2)
             _set_color(ctx, "#030712")
-            ctx.arc(cx, cy, 6, 0, math.pi * 2)
-            ctx.fill()
+            ctx.fill_preserve()
             _set_color(ctx, "#e2e8f0")
-            ctx.set_line_width(2)
-            ctx.arc(cx, cy, 6, 0, math.pi * 2)
             ctx.stroke()
 
     # --- Junctions strip ---
@@ -244,5 +266,4 @@ def generate_image(route_data: dict, wind_data: dict) -> bytes:
     # Export to PNG bytes
     buf = io.BytesIO()
     surface.write_to_png(buf)
-    buf.seek(0)
-    return buf.read()
+    return buf.getvalue()
@@ -365,7 +365,12 @@ async def download_image(
     if cached is None:
         raise HTTPException(status_code=404, detail="Route verlopen of niet gevonden. Genereer een nieuwe route.")
 
-    png_bytes = image_gen.generate_image(cached["route_data"], cached["wind_data"])
+    # Rendering is deterministic per route: a small LRU of recent PNGs lets
+    # repeated downloads (share + retry) skip the cairo render
+    png_bytes = route_cache.get_image(route_id)
+    if png_bytes is None:
+        png_bytes = image_gen.generate_image(cached["route_data"], cached["wind_data"])
+        route_cache.store_image(route_id, png_bytes)
     dist = cached["route_data"].get("actual_distance_km", "route")
     return Response(
         content=png_bytes,
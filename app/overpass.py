@@ -5,35 +5,50 @@ Vervangt osmnx: we fetchen rechtstreeks de RCN-relaties uit OSM en bouwen
 een networkx.MultiDiGraph met rcn_ref nodes, haversine edge-lengtes en bearings.
 """
 
+import gzip
 import hashlib
+import heapq
 import json
 import logging
 import math
 import os
+import struct
+import tempfile
 import time
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 from pathlib import Path
 from typing import Optional
 
 import networkx as nx
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
 # --- Cache config ---
 CACHE_DIR = Path("./overpass_cache")
 CACHE_TTL_SECONDS = 7 * 24 * 3600  # 1 week — netwerk verandert zelden
+CACHE_SUFFIX = ".json.gz"  # gzip level 1: ~5-10x kleiner, decompressie is goedkoop
+_CACHE_KEY_STRUCT = struct.Struct("<iii")
 
 OVERPASS_URL = os.environ.get("OVERPASS_URL", "https://overpass.kumi.systems/api/interpreter")
 USER_AGENT = "RGWND/2.0 (+contact: dev)"
 
 
 def _cache_key(lat: float, lon: float, radius_m: int) -> str:
-    raw = f"{lat:.4f}_{lon:.4f}_{radius_m}"
-    return hashlib.md5(raw.encode()).hexdigest()
+    # Coördinaten gekwantiseerd op 4 decimalen (~11 m), als vaste binaire
+    # struct gehasht i.p.v. via een geformatteerde string
+    h = hashlib.blake2b(digest_size=16)
+    h.update(_CACHE_KEY_STRUCT.pack(round(lat * 10_000), round(lon * 10_000), radius_m))
+    return h.hexdigest()
 
 
 def _read_cache(key: str) -> Optional[dict]:
-    path = CACHE_DIR / f"{key}.json"
+    path = CACHE_DIR / f"{key}{CACHE_SUFFIX}"
     if not path.exists():
         return None
     try:
@@ -41,13 +56,16 @@ def _read_cache(key: str) -> Optional[dict]:
         if time.time() - mtime > CACHE_TTL_SECONDS:
             path.unlink(missing_ok=True)
             return None
-        with open(path) as f:
-            return json.load(f)
-    except (json.JSONDecodeError, OSError):
+        # Ruwe bytes in één read; json.loads decodeert zelf (geen TextIOWrapper)
+        return json.loads(gzip.decompress(path.read_bytes()))
+    except (json.JSONDecodeError, UnicodeDecodeError, EOFError, zlib.error, OSError):
         return None
 
 
 CACHE_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+# Tijdelijke downloadbestanden die zo lang blijven liggen zijn wees
+# (proces gestopt tijdens een download): ruim ruimer dan de langste download
+CACHE_TMP_MAX_AGE_SECONDS = 3600
 
 
 def _cleanup_cache() -> None:
@@ -57,10 +75,13 @@ def _cleanup_cache() -> None:
 
     now = time.time()
     files = []
-    for p in CACHE_DIR.glob("*.json"):
+    # "*.json*" neemt ook oude ongecomprimeerde .json bestanden mee, zodat die via TTL/cap opruimen,
+    # en achtergebleven tijdelijke downloads (*.json.gz.tmp) met een kortere maximale leeftijd
+    for p in CACHE_DIR.glob("*.json*"):
         try:
             stat = p.stat()
-            if now - stat.st_mtime > CACHE_TTL_SECONDS:
+            max_age = CACHE_TMP_MAX_AGE_SECONDS if p.suffix == ".tmp" else CACHE_TTL_SECONDS
+            if now - stat.st_mtime > max_age:
                 p.unlink(missing_ok=True)
                 logger.info("Cache verlopen: %s verwijderd", p.name)
             else:
@@ -83,11 +104,34 @@ def _cleanup_cache() -> None:
                 continue
 
 
-def _write_cache(key: str, data: dict) -> None:
+def _download_to_cache_tmp(resp: requests.Response) -> tuple[bytes, Path]:
+    """
+    Lees een gestreamde response-body in chunks en schrijf hem terwijl hij
+    binnenkomt al gzip-gecomprimeerd naar een tijdelijk cachebestand.
+
+    Compressie overlapt zo met de download i.p.v. erna te komen. Retourneert
+    de volledige body + het tijdelijke pad (pas na geldige JSON committen).
+    """
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
-    path = CACHE_DIR / f"{key}.json"
-    with open(path, "w") as f:
-        json.dump(data, f)
+    # Suffix valt onder de "*.json*"-glob van _cleanup_cache, zodat een
+    # afgebroken download opgeruimd wordt en meetelt voor de cap
+    fd, tmp_path = tempfile.mkstemp(suffix=f"{CACHE_SUFFIX}.tmp", dir=CACHE_DIR)  # mkstemp: al 0o600
+    chunks = []
+    try:
+        with os.fdopen(fd, "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", compresslevel=1) as gz:
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                chunks.append(chunk)
+                gz.write(chunk)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    return b"".join(chunks), Path(tmp_path)
+
+
+def _commit_cache(key: str, tmp_path: Path) -> None:
+    """Zet een volledig geschreven tijdelijk cachebestand atomair op zijn plaats."""
+    path = CACHE_DIR / f"{key}{CACHE_SUFFIX}"
+    os.replace(tmp_path, path)
     # Restrict cache file permissions to owner only
     try:
         os.chmod(path, 0o600)
@@ -98,24 +142,35 @@ def _write_cache(key: str, data: dict) -> None:
 
 # --- Overpass query ---
 
-def fetch_rcn_network(lat: float, lon: float, radius_m: int) -> dict:
-    """
-    Haal het fietsknooppuntennetwerk op uit Overpass API.
+RETRY_AFTER_MAX_SECONDS = 30  # nooit langer wachten dan dit, ook al vraagt de server meer
 
-    Strategie:
-    1. Zoek ways binnen de radius
-    2. Vind RCN-relaties die die ways bevatten
-    3. Haal ALLE ways van die relaties op (ook buiten radius — volledige routes)
-    4. Resolve alle nodes
+# Eén gedeelde sessie: TCP/TLS-verbindingen naar Overpass worden hergebruikt
+# (keep-alive) i.p.v. per query opnieuw opgezet. Retries blijven in de
+# fetch-functies zelf (Retry-After + alerts), dus geen urllib3-Retry hier.
+_session = requests.Session()
+_session.headers["User-Agent"] = USER_AGENT
+_session.mount("https://", HTTPAdapter(pool_maxsize=4))
+_session.mount("http://", HTTPAdapter(pool_maxsize=4))
 
-    Returns het ruwe Overpass JSON response dict.
+
+def _retry_delay(resp: requests.Response, attempt: int) -> float:
     """
-    key = _cache_key(lat, lon, radius_m)
-    cached = _read_cache(key)
-    if cached is not None:
-        return cached
+    Wachttijd vóór een nieuwe poging na 429/503/504.
+
+    Overpass geeft via Retry-After aan wanneer er weer een slot vrij is; dat
+    volgen we i.p.v. blind te wachten. Zonder header: exponentiële backoff.
+    """
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), RETRY_AFTER_MAX_SECONDS)
+        except ValueError:
+            pass
+    return 2 ** attempt
 
-    query = f"""
+
+# Eén keer op module-niveau; per query enkel nog de around-parameters invullen
+_RCN_QUERY_TEMPLATE = """
 [out:json][timeout:120];
 // Stap 1: RCN route-relaties in de buurt
 rel(around:{radius_m},{lat},{lon})["network"="rcn"]["type"="route"]->.rels;
@@ -125,13 +180,58 @@ way(r.rels)->.ways;
 node(around:{radius_m},{lat},{lon})["rcn_ref"]->.knooppunten;
 // Stap 4: output knooppunten met tags
 .knooppunten out body;
-// Stap 5: output ways met body
-.ways out body;
+// Stap 5: output ways zonder tags (enkel node-lijsten worden gebruikt)
+.ways out skel;
 // Stap 6: resolve en output way-nodes (coords)
 .ways > ;
 out skel qt;
 """
 
+
+QUERY_GRID_DEG = 0.01      # query-centra snappen op een raster van ~1 km
+# Radius naar boven afronden op 250 m: klein genoeg dat de query (en de
+# fallback-graph) amper groeit, groot genoeg om nabije aanvragen te delen
+QUERY_RADIUS_STEP_M = 250
+
+
+def _snap_query_area(lat: float, lon: float, radius_m: int) -> tuple[float, float, int]:
+    """
+    Snap het query-centrum op een vast raster en rond de radius naar boven af,
+    zo dat de gesnapte cirkel de oorspronkelijke altijd volledig bevat.
+
+    Aanvragen vanuit dezelfde buurt (en met gelijkaardige afstand) komen zo op
+    dezelfde cache-key uit i.p.v. telkens een bijna volledig overlappende
+    Overpass-query te sturen. De prijs is een iets grotere query: de radius
+    groeit met de afstand tot het rasterpunt (max. ~0,7 km) plus hoogstens
+    één afrondingsstap.
+    """
+    snap_lat = round(round(lat / QUERY_GRID_DEG) * QUERY_GRID_DEG, 4)
+    snap_lon = round(round(lon / QUERY_GRID_DEG) * QUERY_GRID_DEG, 4)
+    offset_m = _haversine(lat, lon, snap_lat, snap_lon)
+    snap_radius = math.ceil((radius_m + offset_m) / QUERY_RADIUS_STEP_M) * QUERY_RADIUS_STEP_M
+    return snap_lat, snap_lon, int(snap_radius)
+
+
+def fetch_rcn_network(lat: float, lon: float, radius_m: int) -> dict:
+    """
+    Haal het fietsknooppuntennetwerk op uit Overpass API.
+
+    Strategie:
+    1. Zoek ways binnen de radius
+    2. Vind RCN-relaties die die ways bevatten
+    3. Haal ALLE ways van die relaties op (ook buiten radius — volledige routes)
+    4. Resolve alle nodes
+
+    Returns het ruwe Overpass JSON response dict.
+    """
+    lat, lon, radius_m = _snap_query_area(lat, lon, radius_m)
+    key = _cache_key(lat, lon, radius_m)
+    cached = _read_cache(key)
+    if cached is not None:
+        return cached
+
+    query = _RCN_QUERY_TEMPLATE.format(radius_m=radius_m, lat=lat, lon=lon)
+
     from .notify import send_alert
 
     logger.info("Overpass query voor lat=%.4f lon=%.4f radius=%dm", lat, lon, radius_m)
@@ -141,22 +241,25 @@ out skel qt;
 
     for attempt in range(max_retries + 1):
         try:
-            resp = requests.post(
+            # stream=True: body wordt pas in _download_to_cache_tmp gelezen
+            resp = _session.post(
                 OVERPASS_URL,
                 data={"data": query},
-                headers={"User-Agent": USER_AGENT},
                 timeout=60,
+                stream=True,
             )
             if resp.status_code in (429, 503, 504) and attempt < max_retries:
                 logger.warning("Overpass API HTTP %d, poging %d/%d", resp.status_code, attempt + 1, max_retries + 1)
-                time.sleep(2 ** attempt)
+                resp.close()
+                time.sleep(_retry_delay(resp, attempt))
                 continue
             if resp.status_code != 200:
                 logger.error("Overpass API fout: HTTP %d", resp.status_code)
                 send_alert(f"Overpass API fout: HTTP {resp.status_code}")
                 resp.raise_for_status()
+            raw_json, cache_tmp = _download_to_cache_tmp(resp)
             break
-        except (requests.Timeout, requests.ConnectionError) as e:
+        except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
             last_error = e
             if attempt < max_retries:
                 logger.warning("Overpass API fout (poging %d/%d): %s", attempt + 1, max_retries + 1, e)
@@ -168,15 +271,20 @@ out skel qt;
             raise ConnectionError(error_msg) from e
 
     try:
-        data = resp.json()
+        # Rechtstreeks op de bytes: geen charset-detectie/decode via resp.text
+        data = json.loads(raw_json)
     except (json.JSONDecodeError, ValueError):
+        cache_tmp.unlink(missing_ok=True)
         error_msg = f"Overpass API retourneerde ongeldig antwoord (status {resp.status_code})"
-        logger.error("%s, body: %.200s", error_msg, resp.text)
+        logger.error("%s, body: %.200s", error_msg, raw_json[:200].decode("utf-8", "replace"))
         send_alert(error_msg)
         raise ConnectionError(error_msg)
     logger.info("Overpass response: %d elementen", len(data.get("elements", [])))
+    resp.close()
+    del resp, raw_json
 
-    _write_cache(key, data)
+    # De body is al geldige JSON en staat al gecomprimeerd op schijf
+    _commit_cache(key, cache_tmp)
     return data
 
 
@@ -201,8 +309,8 @@ way(r.rels)->.ways;
 node(area.belgium)["rcn_ref"]->.knooppunten;
 // Stap 5: output knooppunten met tags
 .knooppunten out body;
-// Stap 6: output ways met body
-.ways out body;
+// Stap 6: output ways zonder tags (enkel node-lijsten worden gebruikt)
+.ways out skel;
 // Stap 7: resolve en output way-nodes (coords)
 .ways > ;
 out skel qt;
@@ -213,15 +321,14 @@ out skel qt;
     max_retries = 2
     for attempt in range(max_retries + 1):
         try:
-            resp = requests.post(
+            resp = _session.post(
                 OVERPASS_URL,
                 data={"data": query},
-                headers={"User-Agent": USER_AGENT},
                 timeout=300,
             )
             if resp.status_code in (429, 503, 504) and attempt < max_retries:
                 logger.warning("Overpass API HTTP %d, poging %d/%d", resp.status_code, attempt + 1, max_retries + 1)
-                time.sleep(2 ** attempt)
+                time.sleep(_retry_delay(resp, attempt))
                 continue
             if resp.status_code != 200:
                 logger.error("Overpass API fout: HTTP %d", resp.status_code)
@@ -239,7 +346,8 @@ out skel qt;
             raise ConnectionError(error_msg) from e
 
     try:
-        data = resp.json()
+        # Rechtstreeks op de bytes: geen charset-detectie/decode via resp.text
+        data = json.loads(resp.content)
     except (json.JSONDecodeError, ValueError):
         error_msg = f"Overpass API retourneerde ongeldig antwoord (full BE, status {resp.status_code})"
         logger.error("%s, body: %.200s", error_msg, resp.text)
@@ -262,14 +370,53 @@ def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
-def _bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Bearing in graden (0–360) van punt 1 naar punt 2."""
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dlam = math.radians(lon2 - lon1)
-    x = math.sin(dlam) * math.cos(phi2)
-    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlam)
-    brng = math.degrees(math.atan2(x, y))
-    return brng % 360
+def _haversine_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Gevectoriseerde haversine in meters. Argumenten zijn scalars of numpy
+    arrays (broadcast): één punt naar veel punten, of paarsgewijs per segment.
+    """
+    R = 6_371_000
+    a = _haversine_term_np(lat1, lon1, lat2, lon2)
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _haversine_term_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    De haversine-term a (sin² van de halve centrale hoek). Stijgt monotoon
+    met de afstand, dus voor een argmin ("dichtstbijzijnde") volstaat a en
+    zijn de sqrt/arctan2-passes naar meters overbodig.
+    """
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlam = np.radians(np.subtract(lon2, lon1))
+    return np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+
+
+def _bearing_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Gevectoriseerde bearing in graden (0–360) van punt 1 naar punt 2; zelfde formule als in _length_bearing_np."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dlam = np.radians(np.subtract(lon2, lon1))
+    x = np.sin(dlam) * np.cos(phi2)
+    y = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlam)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def _length_bearing_np(lat1, lon1, lat2, lon2) -> tuple[np.ndarray, np.ndarray]:
+    """
+    _haversine_np + _bearing_np voor dezelfde segmenten in één keer: de
+    omzetting naar radialen en cos(phi1)/cos(phi2) gebeuren maar één keer.
+    Zelfde formules en volgorde van bewerkingen, dus identieke resultaten.
+    """
+    R = 6_371_000
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    cos_phi1, cos_phi2 = np.cos(phi1), np.cos(phi2)
+    dphi = np.radians(np.subtract(lat2, lat1))
+    dlam = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(dphi / 2) ** 2 + cos_phi1 * cos_phi2 * np.sin(dlam / 2) ** 2
+    length = 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    x = np.sin(dlam) * cos_phi2
+    y = cos_phi1 * np.sin(phi2) - np.sin(phi1) * cos_phi2 * np.cos(dlam)
+    return length, np.degrees(np.arctan2(x, y)) % 360
 
 
 def build_graph(overpass_data: dict) -> nx.MultiDiGraph:
@@ -281,92 +428,271 @@ def build_graph(overpass_data: dict) -> nx.MultiDiGraph:
     """
     elements = overpass_data.get("elements", [])
 
-    nodes = {}   # id -> {lat, lon, tags}
-    ways = []    # [{id, nodes: [...], tags: {...}}]
-
+    # Eén partitie-pass per type; daarna geen type-checks meer per element
+    node_els, ways = [], []
+    append_by_type = {"node": node_els.append, "way": ways.append}
     for el in elements:
-        if el["type"] == "node":
-            nid = el["id"]
-            if nid in nodes:
-                # Bewaar tags van eerdere versie (out body vóór out skel)
-                existing_tags = nodes[nid].get("tags", {})
-                new_tags = el.get("tags", {})
-                merged = {**new_tags, **existing_tags}
-                nodes[nid] = el
-                if merged:
-                    nodes[nid]["tags"] = merged
-            else:
-                nodes[nid] = el
-        elif el["type"] == "way":
-            ways.append(el)
+        append = append_by_type.get(el["type"])
+        if append is not None:
+            append(el)
+
+    nodes = {}   # id -> {lat, lon, tags}
+    for el in node_els:
+        nid = el["id"]
+        prev = nodes.get(nid)
+        if prev is not None:
+            # Bewaar tags van eerdere versie (out body vóór out skel)
+            merged = {**el.get("tags", {}), **prev.get("tags", {})}
+            if merged:
+                el["tags"] = merged
+        nodes[nid] = el
+
+    # Way-node lijsten één keer ophalen (geen herhaalde .get per pass)
+    way_node_lists = [w.get("nodes", []) for w in ways]
 
     G = nx.MultiDiGraph()
 
     # Voeg alle nodes toe die in ways voorkomen
     way_node_ids = set()
-    for w in ways:
-        for nid in w.get("nodes", []):
-            way_node_ids.add(nid)
-
+    for nids in way_node_lists:
+        way_node_ids.update(nids)
+
+    # Node-attributen en coördinaten eerst verzamelen, dan in bulk toevoegen.
+    # Coords als positionele id/lat/lon-lijsten, zodat segment-endpoints
+    # later in één numpy-pass naar indices gaan
+    node_ids, node_lats, node_lons = [], [], []
+    node_rows = []
     for nid in way_node_ids:
         nd = nodes.get(nid)
         if nd is None:
             continue
-        attrs = {"y": nd["lat"], "x": nd["lon"]}
-        tags = nd.get("tags", {})
-        if "rcn_ref" in tags:
+        lat, lon = nd["lat"], nd["lon"]
+        attrs = {"y": lat, "x": lon}
+        tags = nd.get("tags")
+        if tags and "rcn_ref" in tags:
             attrs["rcn_ref"] = tags["rcn_ref"]
-        G.add_node(nid, **attrs)
-
-    # Voeg edges toe (bidirectioneel) voor elke way
-    for w in ways:
-        nids = w.get("nodes", [])
-        for i in range(len(nids) - 1):
-            u, v = nids[i], nids[i + 1]
-            if u not in G or v not in G:
-                continue
-            nu, nv = G.nodes[u], G.nodes[v]
-            length = _haversine(nu["y"], nu["x"], nv["y"], nv["x"])
-            brng_fwd = _bearing(nu["y"], nu["x"], nv["y"], nv["x"])
-            brng_rev = (brng_fwd + 180) % 360
-
-            G.add_edge(u, v, length=length, bearing=brng_fwd)
-            G.add_edge(v, u, length=length, bearing=brng_rev)
+        node_rows.append((nid, attrs))
+        node_ids.append(nid)
+        node_lats.append(lat)
+        node_lons.append(lon)
+    G.add_nodes_from(node_rows)
+    if not node_ids:
+        return G
+
+    # Edges (bidirectioneel) voor elke way, in één add_edges_from.
+    # Alle way-nodes achter elkaar in één int64-array: segment i loopt van
+    # positie i naar i+1, behalve over de grens tussen twee ways.
+    way_lens = np.fromiter(map(len, way_node_lists), dtype=np.int64, count=len(way_node_lists))
+    flat = np.fromiter(chain.from_iterable(way_node_lists), dtype=np.int64, count=int(way_lens.sum()))
+    is_seg_start = np.ones(len(flat), dtype=bool)
+    is_seg_start[np.cumsum(way_lens[way_lens > 0]) - 1] = False
+    seg_from = np.flatnonzero(is_seg_start)
+    all_u, all_v = flat[seg_from], flat[seg_from + 1]
+
+    # Segmenten die in meerdere (overlappende) ways voorkomen maar één keer
+    # (eerste voorkomen, in beide richtingen): identieke parallelle edges
+    # voegen niets toe aan de kortste paden. Stabiele sort op het ongerichte
+    # paar, dan de eerste van elke groep, terug in oorspronkelijke volgorde.
+    lo, hi = np.minimum(all_u, all_v), np.maximum(all_u, all_v)
+    order = np.lexsort((hi, lo))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = (lo[order][1:] != lo[order][:-1]) | (hi[order][1:] != hi[order][:-1])
+    keep = np.sort(order[is_first])
+    all_u, all_v = all_u[keep], all_v[keep]
+
+    # Id -> positie in node_lats/node_lons via searchsorted over de gesorteerde
+    # ids; segmenten met een endpoint zonder coördinaten vallen weg
+    pos_ids = np.array(node_ids, dtype=np.int64)
+    by_id = np.argsort(pos_ids)
+    sorted_ids = pos_ids[by_id]
+
+    def _positions(ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        idx = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+        return by_id[idx], sorted_ids[idx] == ids
+
+    iu, found_u = _positions(all_u)
+    iv, found_v = _positions(all_v)
+    both = found_u & found_v
+    iu, iv = iu[both], iv[both]
+    seg_u, seg_v = all_u[both].tolist(), all_v[both].tolist()
+
+    # Lengte en bearing voor alle segmenten in één numpy-pass (fancy indexing)
+    lats, lons = np.array(node_lats, dtype=float), np.array(node_lons, dtype=float)
+    lat_u, lon_u, lat_v, lon_v = lats[iu], lons[iu], lats[iv], lons[iv]
+    lengths, brngs_fwd = _length_bearing_np(lat_u, lon_u, lat_v, lon_v)
+    brngs_rev = (brngs_fwd + 180) % 360
+
+    edge_rows = []
+    for u, v, length, brng_fwd, brng_rev in zip(
+        seg_u, seg_v, lengths.tolist(), brngs_fwd.tolist(), brngs_rev.tolist()
+    ):
+        edge_rows.append((u, v, {"length": length, "bearing": brng_fwd}))
+        edge_rows.append((v, u, {"length": length, "bearing": brng_rev}))
+    G.add_edges_from(edge_rows)
 
     return G
 
 
+def _node_arrays(G: nx.Graph) -> tuple[list[int], np.ndarray, np.ndarray]:
+    """Node-ids + lat/lon als numpy arrays."""
+    rows = [(nid, d["y"], d["x"]) for nid, d in G.nodes(data=True)]
+    ids = [r[0] for r in rows]
+    lats = np.fromiter((r[1] for r in rows), dtype=float, count=len(rows))
+    lons = np.fromiter((r[2] for r in rows), dtype=float, count=len(rows))
+    return ids, lats, lons
+
+
 def nearest_node(G: nx.MultiDiGraph, lat: float, lon: float) -> int:
-    """Vind de dichtstbijzijnde node in de graph (brute-force op haversine)."""
-    best_node = None
-    best_dist = float("inf")
-    for nid, data in G.nodes(data=True):
-        d = _haversine(lat, lon, data["y"], data["x"])
-        if d < best_dist:
-            best_dist = d
-            best_node = nid
-    if best_node is None:
+    """Vind de dichtstbijzijnde node in de graph (gevectoriseerde haversine-term + argmin)."""
+    ids, lats, lons = _node_arrays(G)
+    if not ids:
         raise ValueError("Graph bevat geen nodes.")
-    return best_node
+    return ids[int(np.argmin(_haversine_term_np(lat, lon, lats, lons)))]
 
 
-def nearest_knooppunt(G: nx.MultiDiGraph, lat: float, lon: float) -> int:
-    """Vind het dichtstbijzijnde knooppunt (node met rcn_ref) in de graph."""
-    best_node = None
-    best_dist = float("inf")
-    for nid, data in G.nodes(data=True):
-        if "rcn_ref" not in data:
-            continue
-        d = _haversine(lat, lon, data["y"], data["x"])
-        if d < best_dist:
-            best_dist = d
-            best_node = nid
-    if best_node is None:
+def nearest_node_and_knooppunt(G: nx.MultiDiGraph, lat: float, lon: float) -> tuple[int, int]:
+    """
+    Dichtstbijzijnde node én dichtstbijzijnde knooppunt (node met rcn_ref):
+    één scan over de nodes en één afstandsberekening, met de
+    knooppunt-selectie als masker daarop.
+    """
+    rows = [(nid, d["y"], d["x"], "rcn_ref" in d) for nid, d in G.nodes(data=True)]
+    if not rows:
+        raise ValueError("Graph bevat geen nodes.")
+    ids = [r[0] for r in rows]
+    lats = np.fromiter((r[1] for r in rows), dtype=float, count=len(rows))
+    lons = np.fromiter((r[2] for r in rows), dtype=float, count=len(rows))
+    is_kp = np.fromiter((r[3] for r in rows), dtype=bool, count=len(rows))
+    if not is_kp.any():
         raise ValueError("Geen knooppunten gevonden in de graph.")
-    return best_node
+
+    a = _haversine_term_np(lat, lon, lats, lons)
+    nearest = ids[int(np.argmin(a))]
+    kp_idx = np.flatnonzero(is_kp)
+    nearest_kp = ids[int(kp_idx[np.argmin(a[kp_idx])])]
+    return nearest, nearest_kp
+
+
+KP_SEARCH_CUTOFF_M = 15000  # knooppunten verder dan dit zijn geen directe buren
 
 
-def build_knooppunt_graph(G_full: nx.MultiDiGraph) -> nx.Graph:
+def _kp_search(src: int, adj: list, is_kp: bytearray, ids: list[int]) -> list[tuple[int, float, array]]:
+    """
+    Korte Dijkstra vanaf één knooppunt die stopt bij naburige knooppunten.
+    Werkt op node-indices van de gecontraheerde graph (zie
+    _contract_chains); retourneert (buur, afstand, pad) per direct bereikbaar
+    knooppunt, in OSM-ids en met de tussenliggende way-nodes terug in het pad.
+
+    Gebruikt predecessor-tracking i.p.v. volledige padkopieën (veel minder geheugen).
+    """
+    inf = float("inf")
+    cutoff = KP_SEARCH_CUTOFF_M
+    # Lokale bindings: dit is de binnenste lus van de hele build (één
+    # Dijkstra per knooppunt), attribuut-/global-lookups tellen hier mee
+    heappush, heappop = heapq.heappush, heapq.heappop
+    found = []
+    # Min-heap: (afstand, node)
+    heap = [(0.0, src)]
+    dist_map = {src: 0.0}
+    dist_get = dist_map.get
+    prev = {}  # node -> (vorige node, tussenliggende nodes van die keten)
+
+    while heap:
+        dist, node = heappop(heap)
+
+        # Skip als we al een kortere route kennen
+        if dist > dist_get(node, inf):
+            continue
+
+        # Naburig knooppunt gevonden (niet de bron zelf)
+        if node != src and is_kp[node]:
+            # Reconstrueer pad via predecessors (ketens achterstevoren)
+            path = []
+            cur = node
+            while cur != src:
+                path.append(cur)
+                cur, interior = prev[cur]
+                path.extend(reversed(interior))
+            path.append(src)
+            path.reverse()
+            # Compacte int64-array i.p.v. list van Python-ints: ~4x
+            # kleiner in geheugen én in de pickle (één bytes-blob)
+            found.append((ids[node], dist, array("q", [ids[i] for i in path])))
+            continue  # Niet verder zoeken voorbij dit knooppunt
+
+        # Buren verkennen. Segmentlengtes van een keten één voor één optellen,
+        # zoals de Dijkstra over de losse way-nodes dat deed: bit-identieke
+        # afstanden. Lengtes zijn ≥ 0, dus de cutoff op het eind volstaat.
+        for neighbor, lengths, interior in adj[node]:
+            new_dist = dist
+            for length in lengths:
+                new_dist += length
+            if new_dist > cutoff:
+                continue
+            if new_dist < dist_get(neighbor, inf):
+                dist_map[neighbor] = new_dist
+                prev[neighbor] = (node, interior)
+                heappush(heap, (new_dist, neighbor))
+
+    return found
+
+
+def _contract_chains(adj: list, is_kp: bytearray) -> list:
+    """
+    Contraheer ketens van graad-2 way-nodes (geen knooppunt) tot één edge
+    tussen hun eindpunten. Het gros van de way-nodes ligt op zo'n keten;
+    de knooppunt-Dijkstra hoeft ze dan niet elk via de heap te passeren.
+
+    adj: per node-index [(buur, lengte), ...], symmetrisch (build_graph legt
+    elk segment in beide richtingen aan). Resultaat: per node-index
+    [(eindpunt, segmentlengtes, tussenliggende nodes), ...] in dezelfde
+    volgorde als adj; leeg voor nodes binnenin een keten.
+    """
+    def is_interior(i: int) -> bool:
+        nbrs = adj[i]
+        return (not is_kp[i] and len(nbrs) == 2
+                and nbrs[0][0] != nbrs[1][0] and i != nbrs[0][0] and i != nbrs[1][0])
+
+    interior_flag = bytearray(is_interior(i) for i in range(len(adj)))
+    contracted = [[] for _ in range(len(adj))]
+    for u, nbrs in enumerate(adj):
+        if interior_flag[u]:
+            continue
+        out = contracted[u]
+        for nbr, length in nbrs:
+            lengths = [length]
+            interior = []
+            prev_node, cur = u, nbr
+            while interior_flag[cur]:
+                interior.append(cur)
+                (a, la), (b, lb) = adj[cur]
+                if a != prev_node:
+                    prev_node, cur = cur, a
+                    lengths.append(la)
+                else:
+                    prev_node, cur = cur, b
+                    lengths.append(lb)
+            if cur == u and interior:
+                continue  # lus terug naar zichzelf: nooit een korter pad
+            out.append((cur, tuple(lengths), tuple(interior)))
+    return contracted
+
+
+# Worker-state voor parallelle _kp_search: adjacency wordt één keer per
+# proces doorgegeven (initializer) i.p.v. per taak gepickled
+_kp_worker_state: tuple = ()
+
+
+def _kp_worker_init(adj: list, is_kp: bytearray, ids: list[int]) -> None:
+    global _kp_worker_state
+    _kp_worker_state = (adj, is_kp, ids)
+
+
+def _kp_worker_search(src: int) -> list[tuple[int, float, array]]:
+    return _kp_search(src, *_kp_worker_state)
+
+
+def build_knooppunt_graph(G_full: nx.MultiDiGraph, workers: int = 1) -> nx.Graph:
     """
     Bouw een vereenvoudigde graph met enkel knooppunten als nodes.
     Edges verbinden direct-naburige knooppunten (geen tussenliggend knooppunt
@@ -374,53 +700,51 @@ def build_knooppunt_graph(G_full: nx.MultiDiGraph) -> nx.Graph:
 
     Gebruikt een geoptimaliseerde Dijkstra die stopt zodra een naburig
     knooppunt bereikt wordt, zodat we niet het hele netwerk doorzoeken.
+    Ketens van graad-2 way-nodes worden vooraf gecontraheerd, zodat die
+    Dijkstra enkel over kruispunten en knooppunten loopt.
+    De zoektochten per knooppunt zijn onafhankelijk: met workers > 1 lopen
+    ze over meerdere processen (zinvol voor heel België, niet per request).
     """
-    import heapq
-
     kp_nodes = [n for n, d in G_full.nodes(data=True) if "rcn_ref" in d]
-    kp_set = set(kp_nodes)
 
     K = nx.Graph()
     for n in kp_nodes:
         nd = G_full.nodes[n]
         K.add_node(n, y=nd["y"], x=nd["x"], rcn_ref=nd["rcn_ref"])
 
-    # Per knooppunt: korte Dijkstra die stopt bij naburige knooppunten
-    # Gebruikt predecessor-tracking i.p.v. volledige padkopieën (veel minder geheugen)
-    for src in kp_nodes:
-        # Min-heap: (afstand, node)
-        heap = [(0.0, src)]
-        dist_map = {src: 0.0}
-        prev = {}  # node -> vorige node (voor padreconstructie)
-
-        while heap:
-            dist, node = heapq.heappop(heap)
-
-            # Skip als we al een kortere route kennen
-            if dist > dist_map.get(node, float("inf")):
-                continue
-
-            # Naburig knooppunt gevonden (niet de bron zelf)
-            if node != src and node in kp_set:
-                if not K.has_edge(src, node):
-                    # Reconstrueer pad via predecessors
-                    path = []
-                    cur = node
-                    while cur is not None:
-                        path.append(cur)
-                        cur = prev.get(cur)
-                    path.reverse()
-                    K.add_edge(src, node, length=dist, full_path=path)
-                continue  # Niet verder zoeken voorbij dit knooppunt
-
-            # Buren verkennen
-            for _, neighbor, key, edge_data in G_full.edges(node, data=True, keys=True):
-                new_dist = dist + edge_data.get("length", 0.0)
-                if new_dist > 15000:
-                    continue
-                if new_dist < dist_map.get(neighbor, float("inf")):
-                    dist_map[neighbor] = new_dist
-                    prev[neighbor] = node
-                    heapq.heappush(heap, (new_dist, neighbor))
-
+    # Nodes hernummerd naar 0..N-1 (oplopend in OSM-id, zodat gelijke
+    # afstanden in de heap in dezelfde volgorde afgehandeld worden). Adjacency
+    # is een lijst geïndexeerd op node-index met (buur, lengte) in de volgorde
+    # van G_full.edges(node); knooppunt-lidmaatschap is een bytearray-vlag.
+    ids = sorted(G_full)
+    index = {n: i for i, n in enumerate(ids)}
+    adj = [
+        [(index[nbr], d.get("length", 0.0)) for nbr, keydict in G_full.adj[n].items() for d in keydict.values()]
+        for n in ids
+    ]
+    is_kp = bytearray(len(ids))
+    for n in kp_nodes:
+        is_kp[index[n]] = 1
+    kp_idx = [index[n] for n in kp_nodes]
+    del index
+    adj = _contract_chains(adj, is_kp)
+
+    if workers > 1 and len(kp_nodes) > 1:
+        chunksize = max(1, len(kp_nodes) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_kp_worker_init,
+                                 initargs=(adj, is_kp, ids)) as pool:
+            results = list(pool.map(_kp_worker_search, kp_idx, chunksize=chunksize))
+    else:
+        results = [_kp_search(src, adj, is_kp, ids) for src in kp_idx]
+
+    # Ongerichte knooppunt-edges: eerst gevonden richting wint (pad start bij
+    # src); results staan in kp_nodes-volgorde, dus resultaat is deterministisch
+    kp_edges = {}
+    for src, found in zip(kp_nodes, results):
+        for node, dist, path in found:
+            pair = (src, node) if src < node else (node, src)
+            if pair not in kp_edges:
+                kp_edges[pair] = (src, node, {"length": dist, "full_path": path})
+
+    K.add_edges_from(kp_edges.values())
     return K
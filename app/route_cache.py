@@ -2,19 +2,27 @@
 
 import time
 import uuid
+from collections import OrderedDict
 from typing import Any
 
 _CACHE_TTL = 900  # 15 minutes
 _MAX_ENTRIES = 500
+# Fixed TTL: insertion order (dict order) is also expiry order, so the
+# oldest/expired entries are always at the front
 _cache: dict[str, dict[str, Any]] = {}
 
+# Rendered PNGs (~1080x1080, a few hundred KB each) are kept in a separate,
+# small LRU instead of on the route entries, so they don't scale with
+# _MAX_ENTRIES
+_MAX_IMAGES = 8
+_images: OrderedDict[str, bytes] = OrderedDict()
+
 
 def store(route_data: dict, wind_data: dict) -> str:
     """Store route data and return a unique route_id."""
     _cleanup()
     if len(_cache) >= _MAX_ENTRIES:
-        oldest_key = min(_cache, key=lambda k: _cache[k]["expires"])
-        del _cache[oldest_key]
+        del _cache[next(iter(_cache))]
     route_id = uuid.uuid4().hex
     _cache[route_id] = {
         "route_data": route_data,
@@ -35,8 +43,26 @@ def get(route_id: str) -> dict | None:
 
 
 def _cleanup() -> None:
-    """Remove expired entries (piggyback on access)."""
+    """Remove expired entries (piggyback on access). Only walks the expired prefix."""
     now = time.time()
-    expired = [k for k, v in _cache.items() if v["expires"] < now]
-    for k in expired:
-        del _cache[k]
+    while _cache:
+        oldest_key = next(iter(_cache))
+        if _cache[oldest_key]["expires"] >= now:
+            break
+        del _cache[oldest_key]
+
+
+def get_image(route_id: str) -> bytes | None:
+    """Return the cached rendered image for a route, or None."""
+    png = _images.get(route_id)
+    if png is not None:
+        _images.move_to_end(route_id)
+    return png
+
+
+def store_image(route_id: str, png: bytes) -> None:
+    """Cache a rendered image, evicting the least recently used beyond _MAX_IMAGES."""
+    _images[route_id] = png
+    _images.move_to_end(route_id)
+    while len(_images) > _MAX_IMAGES:
+        _images.popitem(last=False)
@@ -1,7 +1,10 @@
 import logging
+from itertools import chain
+
 import networkx as nx
 import numpy as np
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Optional
 from . import weather
@@ -14,40 +17,37 @@ logger = logging.getLogger(__name__)
 _UTURN_THRESHOLD_DEG = 150  # hoeken > 150° zijn scherpe bochten
 _UTURN_PENALTY_FRACTION = 0.25  # elke U-turn leidt tot +25% van totale effort
 
-
-# --- Bearing & Geometry ---
-
-def _bearing_deg(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Richting in graden (0–360) van punt 1 naar punt 2."""
-    import math
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dlam = math.radians(lon2 - lon1)
-    x = math.sin(dlam) * math.cos(phi2)
-    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(dlam)
-    return math.degrees(math.atan2(x, y)) % 360
+# Wind ophalen (Open-Meteo) loopt parallel met het ophalen/bouwen van de graph:
+# die heeft de wind pas nodig bij de effort-berekening
+_io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="routing-io")
 
 
 # --- Wind Effort Calculation ---
-def calculate_effort_cost(length: float, bearing: float, wind_speed: float, wind_direction: float) -> float:
-    if length == 0:
-        return 0.0
-    angle_diff = abs(bearing - wind_direction)
-    if angle_diff > 180:
-        angle_diff = 360 - angle_diff
-    wind_factor = np.cos(np.radians(angle_diff))
-    cost = length * (1 + (wind_speed / 10) * wind_factor)
-    return max(cost, length * 0.2)
+def _effort_from_wind_factor(lengths: np.ndarray, wind_factors: np.ndarray,
+                             wind_speed: float) -> np.ndarray:
+    """Effort per segment gegeven cos(hoek tussen rijrichting en wind)."""
+    cost = lengths * (1 + (wind_speed / 10) * wind_factors)
+    return np.maximum(cost, lengths * 0.2)
+
+def _effort_cost_np(lengths: np.ndarray, bearings: np.ndarray,
+                    wind_speed: float, wind_direction: float) -> np.ndarray:
+    """
+    Effort per segment: lengte · (1 + wind/10 · cos(bearing − windrichting)),
+    met als ondergrens 20% van de lengte. cos is even en 360°-periodiek, dus
+    de hoek hoeft niet eerst naar ≤180° gevouwen.
+    """
+    return _effort_from_wind_factor(lengths, np.cos(np.radians(bearings - wind_direction)), wind_speed)
 
 def add_wind_effort_weight(G: nx.DiGraph, wind_speed_ms: float, wind_direction_deg: float) -> None:
     """Voeg effort-gewicht toe aan alle edges in de graph (in-place, geen kopie)."""
-    for u, v, key, data in G.edges(data=True, keys=True):
-        length = data.get('length', 0.0)
-        bearing = data.get('bearing', None)
-        if bearing is None:
-            cost = length
-        else:
-            cost = calculate_effort_cost(length, bearing, wind_speed_ms, wind_direction_deg)
-        G.edges[u, v, key]['effort'] = float(cost)
+    edge_data = [data for _, _, data in G.edges(data=True)]
+    lengths = np.fromiter((d.get('length', 0.0) for d in edge_data), dtype=float, count=len(edge_data))
+    bearings = np.fromiter((d.get('bearing', np.nan) for d in edge_data), dtype=float, count=len(edge_data))
+    # Edges zonder bearing: effort = lengte
+    costs = np.where(np.isnan(bearings), lengths,
+                     _effort_cost_np(lengths, bearings, wind_speed_ms, wind_direction_deg))
+    for data, cost in zip(edge_data, costs.tolist()):
+        data['effort'] = cost
 
 def _sum_path_attr_multidigraph(G: nx.MultiDiGraph, path: List[int], attr: str) -> float:
     """
@@ -91,52 +91,132 @@ def _nodes_to_polyline_from_coords(path: List[int], coords: dict[int, tuple[floa
 
 # --- Knooppunt loop: wind effort op condensed edges ---
 
-def _add_knooppunt_effort_dynamic(K: nx.Graph, graph_mgr: GraphManager,
-                                   wind_speed: float, wind_dir: float):
+def _segments_from_sqlite(edge_data: list[dict], graph_mgr: GraphManager):
     """
-    Bereken wind-effort per richting voor knooppunt-edges via SQLite lookups.
-    Gebruikt voor pre-built graph pad (geen volledige G in geheugen).
+    Segmentlengtes + bearings (in padrichting) voor knooppunt-edges zonder
+    voorberekende segmentgeometrie: coords uit SQLite, dan haversine/bearing.
+    Retourneert (lengtes, bearings, segmenten per edge, coords).
     """
-    # Verzamel alle node-paren uit full_path van alle edges
-    all_node_ids = set()
-    for u, v, data in K.edges(data=True):
-        for n in data["full_path"]:
-            all_node_ids.add(n)
+    # Alle paden achter elkaar in één platte array (CSR-stijl: lengte per edge),
+    # zodat lengte/bearing in één numpy-pass over alle segmenten gaan.
+    # De unieke node-ids volgen uit de platte array.
+    paths = [data["full_path"] for data in edge_data]
+    path_lens = np.fromiter(map(len, paths), dtype=np.int64, count=len(paths))
+    flat_ids = np.fromiter(chain.from_iterable(paths), dtype=np.int64, count=int(path_lens.sum()))
+    unique_ids = np.unique(flat_ids)  # gesorteerd: ook gunstig voor de PK-lookups
 
     # Batch lookup coords
-    coords = graph_mgr.get_node_coords(list(all_node_ids))
-
-    for u, v, data in K.edges(data=True):
-        full_path = data["full_path"]
-        # Bereken effort voorwaarts
-        effort_fwd = 0.0
-        effort_rev = 0.0
-        for i in range(len(full_path) - 1):
-            n1, n2 = full_path[i], full_path[i + 1]
-            c1, c2 = coords.get(n1), coords.get(n2)
-            if c1 is None or c2 is None:
-                continue
-            length = overpass._haversine(c1[0], c1[1], c2[0], c2[1])
-            bearing_fwd = overpass._bearing(c1[0], c1[1], c2[0], c2[1])
-            bearing_rev = (bearing_fwd + 180) % 360
-            effort_fwd += calculate_effort_cost(length, bearing_fwd, wind_speed, wind_dir)
-            effort_rev += calculate_effort_cost(length, bearing_rev, wind_speed, wind_dir)
+    coords = graph_mgr.get_node_coords(unique_ids.tolist())
 
-        data["effort_fwd"] = effort_fwd
-        data["effort_rev"] = effort_rev
+    # Coords per unieke node, dan via searchsorted naar elke positie in de
+    # platte array (gedeelde knooppunten niet opnieuw per pad opzoeken)
+    missing = (np.nan, np.nan)
+    unique_coords = np.array([coords.get(n, missing) for n in unique_ids.tolist()], dtype=float).reshape(-1, 2)
+    flat_coords = unique_coords[np.searchsorted(unique_ids, flat_ids)]
+
+    # Segment i loopt van node i naar i+1, behalve op de laatste node van elk pad
+    is_seg_start = np.ones(len(flat_coords), dtype=bool)
+    is_seg_start[np.cumsum(path_lens) - 1] = False
+    seg_from = np.flatnonzero(is_seg_start)
+
+    lat1, lon1 = flat_coords[seg_from, 0], flat_coords[seg_from, 1]
+    lat2, lon2 = flat_coords[seg_from + 1, 0], flat_coords[seg_from + 1, 1]
+    length, bearing_fwd = overpass._length_bearing_np(lat1, lon1, lat2, lon2)
+    return length, bearing_fwd, path_lens - 1, coords
+
+
+def _add_knooppunt_effort_dynamic(K: nx.Graph, graph_mgr: GraphManager,
+                                   wind_speed: float, wind_dir: float) -> dict[int, tuple[float, float]]:
+    """
+    Bereken wind-effort per richting voor knooppunt-edges in de pre-built
+    graph (geen volledige G in geheugen). Segmentlengtes en -bearings komen
+    uit de pickle (seg_length / seg_bearing, zie scripts/build_graph.py); voor
+    een oudere pickle zonder die attributen via SQLite-coords.
+    Retourneert eventueel opgehaalde coords zodat de route-geometrie ze kan
+    hergebruiken (leeg als er niets opgehaald moest worden).
+    """
+    edge_data = [data for _, _, data in K.edges(data=True)]
+    if edge_data and all("seg_length" in data for data in edge_data):
+        # Voorberekend: arrays aaneenplakken als bytes, geen per-element pass
+        seg_counts = np.fromiter((len(data["seg_length"]) for data in edge_data),
+                                 dtype=np.int64, count=len(edge_data))
+        length = np.frombuffer(b"".join(data["seg_length"].tobytes() for data in edge_data), dtype=float)
+        bearing_fwd = np.frombuffer(b"".join(data["seg_bearing"].tobytes() for data in edge_data), dtype=float)
+        coords = {}
+    else:
+        length, bearing_fwd, seg_counts, coords = _segments_from_sqlite(edge_data, graph_mgr)
+    seg_edge = np.repeat(np.arange(len(edge_data)), seg_counts)
+
+    # Achterwaarts rijden = bearing + 180°, dus cos keert gewoon van teken:
+    # één trig-pass voor beide richtingen
+    wind_factor = np.cos(np.radians(bearing_fwd - wind_dir))
+
+    # Segmenten zonder coords (NaN) tellen niet mee
+    has_coords = ~np.isnan(length)
+    effort_fwd = np.where(has_coords, _effort_from_wind_factor(length, wind_factor, wind_speed), 0.0)
+    effort_rev = np.where(has_coords, _effort_from_wind_factor(length, -wind_factor, wind_speed), 0.0)
+    effort_fwd = np.bincount(seg_edge, weights=effort_fwd, minlength=len(edge_data))
+    effort_rev = np.bincount(seg_edge, weights=effort_rev, minlength=len(edge_data))
+
+    for data, fwd, rev in zip(edge_data, effort_fwd.tolist(), effort_rev.tolist()):
+        data["effort_fwd"] = fwd
+        data["effort_rev"] = rev
+
+    return coords
 
 
 def _add_knooppunt_effort(K: nx.Graph, G_effort: nx.MultiDiGraph):
     """
     Bereken wind-effort per richting voor elke edge in de knooppuntgraph.
     Slaat effort_fwd (u→v) en effort_rev (v→u) op.
+
+    Zelfde resultaat als _sum_path_attr_multidigraph per pad, maar in numpy:
+    effort per gericht (u, v)-paar in G één keer bepaald (minimum over
+    parallelle edges, lengte als geen enkele edge effort heeft), segmenten
+    van alle paden via searchsorted opgezocht en per knooppunt-edge opgeteld.
     """
-    for u, v, data in K.edges(data=True):
-        full_path = data["full_path"]
-        # Voorwaarts: pad zoals opgeslagen
-        data["effort_fwd"] = _sum_path_attr_multidigraph(G_effort, full_path, "effort")
-        # Achterwaarts: omgekeerd pad
-        data["effort_rev"] = _sum_path_attr_multidigraph(G_effort, full_path[::-1], "effort")
+    edge_data = [data for _, _, data in K.edges(data=True)]
+    if not edge_data:
+        return
+
+    # (u, v) als één int64-sleutel over node-indices in G
+    ids = np.array(sorted(G_effort), dtype=np.int64)
+    n = len(ids)
+    g_edges = [(u, v, d.get("effort", np.nan), d.get("length", 0.0)) for u, v, d in G_effort.edges(data=True)]
+    src = np.searchsorted(ids, np.fromiter((e[0] for e in g_edges), dtype=np.int64, count=len(g_edges)))
+    dst = np.searchsorted(ids, np.fromiter((e[1] for e in g_edges), dtype=np.int64, count=len(g_edges)))
+    g_effort = np.fromiter((e[2] for e in g_edges), dtype=float, count=len(g_edges))
+    g_length = np.fromiter((e[3] for e in g_edges), dtype=float, count=len(g_edges))
+    keys = src * n + dst
+    order = np.argsort(keys, kind="stable")
+    keys, g_effort, g_length = keys[order], g_effort[order], g_length[order]
+    group_start = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    pair_keys = keys[group_start]
+    pair_effort = np.fmin.reduceat(g_effort, group_start)  # fmin negeert NaN (= geen effort)
+    pair_effort = np.where(np.isnan(pair_effort), np.minimum.reduceat(g_length, group_start), pair_effort)
+
+    # Alle paden plat achter elkaar; het omgekeerde pad via indexrekenkunde
+    path_lens = np.fromiter((len(data["full_path"]) for data in edge_data), dtype=np.int64, count=len(edge_data))
+    flat_idx = np.searchsorted(ids, np.fromiter(chain.from_iterable(data["full_path"] for data in edge_data),
+                                                dtype=np.int64, count=int(path_lens.sum())))
+    ends = np.cumsum(path_lens)
+    rev_idx = flat_idx[np.repeat(ends - path_lens + ends - 1, path_lens) - np.arange(len(flat_idx))]
+    is_seg_start = np.ones(len(flat_idx), dtype=bool)
+    is_seg_start[ends - 1] = False
+    seg_from = np.flatnonzero(is_seg_start)
+    seg_edge = np.repeat(np.arange(len(edge_data)), path_lens - 1)
+
+    def _path_sums(node_idx: np.ndarray) -> list[float]:
+        seg_keys = node_idx[seg_from] * n + node_idx[seg_from + 1]
+        pos = np.minimum(np.searchsorted(pair_keys, seg_keys), len(pair_keys) - 1)
+        # Segment zonder edge in G telt niet mee (zoals in _sum_path_attr_multidigraph)
+        seg_effort = np.where(pair_keys[pos] == seg_keys, pair_effort[pos], 0.0)
+        return np.bincount(seg_edge, weights=seg_effort, minlength=len(edge_data)).tolist()
+
+    for data, fwd, rev in zip(edge_data, _path_sums(flat_idx), _path_sums(rev_idx)):
+        # Voorwaarts: pad zoals opgeslagen; achterwaarts: omgekeerd pad
+        data["effort_fwd"] = fwd
+        data["effort_rev"] = rev
 
 
 def _expand_kp_loop(kp_loop: List[int], K: nx.Graph) -> List[int]:
@@ -161,33 +241,47 @@ def _expand_kp_loop(kp_loop: List[int], K: nx.Graph) -> List[int]:
     return full_path
 
 
+def _loop_adjacency(K: nx.Graph, start_kp: int) -> dict[int, list[tuple[int, float, float]]]:
+    """
+    Adjacency voor de loop-DFS: per knooppunt (buur, edge-lengte, hemelsbrede
+    afstand buur→start). De afstand-tot-start zit mee in de tuple, zodat de
+    inner loop geen aparte dict-lookup meer doet. Onafhankelijk van de
+    tolerantie, dus één keer bouwen voor alle DFS-pogingen.
+    """
+    # Eén gevectoriseerde numpy-pass i.p.v. een haversine-call per knooppunt;
+    # ids + lat/lon-arrays uit één scan over de node-attributen
+    s_lat, s_lon = K.nodes[start_kp]["y"], K.nodes[start_kp]["x"]
+    kp_ids, kp_lats, kp_lons = overpass._node_arrays(K)
+    dist_to_start: dict[int, float] = dict(
+        zip(kp_ids, overpass._haversine_np(s_lat, s_lon, kp_lats, kp_lons).tolist())
+    )
+
+    adj_list: dict[int, list[tuple[int, float, float]]] = {n: [] for n in kp_ids}
+    for u, v, length in K.edges(data="length"):
+        adj_list[u].append((v, length, dist_to_start[v]))
+        adj_list[v].append((u, length, dist_to_start[u]))
+    return adj_list
+
+
 def _find_knooppunt_loops(K: nx.Graph, start_kp: int, target_m: float,
                           tolerance: float, max_depth: int = 15,
-                          time_limit: float = 30.0):
+                          time_limit: float = 30.0,
+                          adj_list: Optional[dict[int, list[tuple[int, float, float]]]] = None):
     """
     DFS-gebaseerde loop-zoeker op de knooppuntgraph.
     Vindt eenvoudige cycli vanuit start_kp binnen de afstandstolerantie.
     Gebruikt recursieve backtracking: gedeelde mutable set/list — geen frozenset/list
     kopieën bij elke stack-push. Path-kopie enkel bij gevonden loop (zelden).
     Stopt na time_limit seconden en retourneert wat gevonden is.
+    adj_list: optioneel vooraf gebouwde _loop_adjacency (hergebruik tussen pogingen).
     """
     min_dist = target_m * (1 - tolerance)
     max_dist = target_m * (1 + tolerance)
     candidates = []
     t_start = time.perf_counter()
 
-    # Pre-build adjacency list: geen dict-lookup per edge in de inner loop
-    adj_list: dict[int, list[tuple[int, float]]] = {n: [] for n in K.nodes()}
-    for u, v, data in K.edges(data=True):
-        adj_list[u].append((v, data["length"]))
-        adj_list[v].append((u, data["length"]))
-
-    # Pre-compute haversine-afstand van elk knooppunt tot start: O(1) lookup
-    s_lat, s_lon = K.nodes[start_kp]["y"], K.nodes[start_kp]["x"]
-    dist_to_start: dict[int, float] = {
-        n: overpass._haversine(K.nodes[n]["y"], K.nodes[n]["x"], s_lat, s_lon)
-        for n in K.nodes()
-    }
+    if adj_list is None:
+        adj_list = _loop_adjacency(K, start_kp)
 
     counter = [0]  # mutable int via closure voor tijdslimiet-check
 
@@ -199,7 +293,7 @@ def _find_knooppunt_loops(K: nx.Graph, start_kp: int, target_m: float,
                         time.perf_counter() - t_start, len(candidates), counter[0])
             return True
 
-        for neighbor, edge_len in adj_list[node]:
+        for neighbor, edge_len, home_dist in adj_list[node]:
             new_dist = dist + edge_len
 
             if neighbor == start_kp:
@@ -214,7 +308,7 @@ def _find_knooppunt_loops(K: nx.Graph, start_kp: int, target_m: float,
             if neighbor in visited:          continue
             if new_dist > max_dist:          continue
             if len(path) >= max_depth:       continue
-            if new_dist + dist_to_start[neighbor] > max_dist: continue
+            if new_dist + home_dist > max_dist: continue
 
             visited.add(neighbor)
             path.append(neighbor)
@@ -229,42 +323,83 @@ def _find_knooppunt_loops(K: nx.Graph, start_kp: int, target_m: float,
     return candidates
 
 
-def _score_loop(kp_loop: List[int], K: nx.Graph, target_m: float) -> float:
+def _score_loops(kp_loops: List[List[int]], K: nx.Graph, target_m: float) -> np.ndarray:
     """
-    Score een knooppunt-loop: lagere score = beter.
+    Score knooppunt-loops: lagere score = beter (één score per loop).
     Combineert wind-effort met afstandsafwijking en bestraft U-turns.
+    Alle kandidaten samen in één numpy-pass.
     """
-    total_effort = 0.0
-    total_length = 0.0
-    for i in range(len(kp_loop) - 1):
-        u, v = kp_loop[i], kp_loop[i + 1]
-        edge = K.edges[u, v]
-        total_length += edge["length"]
+    # Elke gerichte leg (u, v) krijgt één index; kandidaat-loops delen de
+    # meeste legs. Lengte, effort in rijrichting en bearing worden per unieke
+    # leg één keer bepaald, daarna per loop opgeteld via bincount (sequentieel
+    # in leg-volgorde, dus dezelfde som als een Python-loop).
+    leg_index: dict[tuple[int, int], int] = {}
+    leg_ids = np.fromiter(
+        (leg_index.setdefault(leg, len(leg_index))
+         for leg in chain.from_iterable(zip(kp_loop, kp_loop[1:]) for kp_loop in kp_loops)),
+        dtype=np.intp,
+    )
+    edges, nodes = K.edges, K.nodes
+    leg_rows = []
+    for u, v in leg_index:
+        edge = edges[u, v]
         # Effort in de juiste richting
-        if edge["full_path"][0] == u:
-            total_effort += edge["effort_fwd"]
-        else:
-            total_effort += edge["effort_rev"]
-
-    # Penalty voor scherpe bochten / U-turns
-    uturn_penalty = 0.0
-    for i in range(1, len(kp_loop) - 1):
-        prev_n = kp_loop[i - 1]
-        curr_n = kp_loop[i]
-        next_n = kp_loop[i + 1]
-        pd = K.nodes[prev_n]
-        cd = K.nodes[curr_n]
-        nd = K.nodes[next_n]
-        brg_in = _bearing_deg(pd['y'], pd['x'], cd['y'], cd['x'])
-        brg_out = _bearing_deg(cd['y'], cd['x'], nd['y'], nd['x'])
-        angle_change = abs(brg_out - brg_in)
-        if angle_change > 180:
-            angle_change = 360 - angle_change
-        if angle_change > _UTURN_THRESHOLD_DEG:
-            uturn_penalty += total_effort * _UTURN_PENALTY_FRACTION
-
-    distance_penalty = abs(total_length - target_m) * 5
-    return total_effort + distance_penalty + uturn_penalty
+        effort = edge["effort_fwd"] if edge["full_path"][0] == u else edge["effort_rev"]
+        nu, nv = nodes[u], nodes[v]
+        leg_rows.append((edge["length"], effort, nu["y"], nu["x"], nv["y"], nv["x"]))
+    legs = np.array(leg_rows, dtype=float).reshape(-1, 6)
+
+    # Legs van alle loops achter elkaar; leg j en j+1 horen bij dezelfde loop
+    # tenzij j de laatste leg van zijn loop is
+    loop_lens = np.fromiter(map(len, kp_loops), dtype=np.int64, count=len(kp_loops))
+    leg_loop = np.repeat(np.arange(len(kp_loops)), loop_lens - 1)
+    lengths = np.bincount(leg_loop, weights=legs[leg_ids, 0], minlength=len(kp_loops))
+    efforts = np.bincount(leg_loop, weights=legs[leg_ids, 1], minlength=len(kp_loops))
+
+    # Penalty voor scherpe bochten / U-turns: bocht j zit tussen leg j en j+1
+    bearings = overpass._bearing_np(legs[:, 2], legs[:, 3], legs[:, 4], legs[:, 5])[leg_ids]
+
+    angle_change = np.abs(bearings[1:] - bearings[:-1])
+    angle_change = np.where(angle_change > 180, 360 - angle_change, angle_change)
+    is_uturn = (angle_change > _UTURN_THRESHOLD_DEG) & (leg_loop[1:] == leg_loop[:-1])
+    n_uturns = np.bincount(leg_loop[1:][is_uturn], minlength=len(kp_loops))
+    uturn_penalty = n_uturns * efforts * _UTURN_PENALTY_FRACTION
+
+    distance_penalty = np.abs(lengths - target_m) * 5
+    return efforts + distance_penalty + uturn_penalty
+
+
+def _keep_start_component(K: nx.Graph, start_kp: int) -> None:
+    """
+    Beperk K (in-place) tot de samenhangende component van het startknooppunt.
+    De DFS komt nooit in losse eilanden, dus effort berekenen voor hun edges is
+    verspild werk. Eén BFS vanaf de start, geen lijst van alle componenten.
+    """
+    if start_kp not in K:
+        return
+    component = nx.node_connected_component(K, start_kp)
+    if len(component) < K.number_of_nodes():
+        K.remove_nodes_from([n for n in K if n not in component])
+
+
+# --- Wind (parallel met graph-prep) ---
+
+def _fetch_wind(lat: float, lon: float, planned_datetime: Optional[datetime]) -> tuple[Optional[dict], float]:
+    """Haal actuele of voorspelde wind op; retourneert ook het tijdstip van ontvangst."""
+    if planned_datetime:
+        wind_data = weather.get_forecast_wind_data(lat, lon, planned_datetime)
+    else:
+        wind_data = weather.get_wind_data(lat, lon)
+    return wind_data, time.perf_counter()
+
+
+def _await_wind(wind_future: Future, t_start: float, timings: dict) -> dict:
+    """Wacht op de wind-fetch en registreer hoe lang geocoding + weer duurde."""
+    wind_data, t_done = wind_future.result()
+    if not wind_data:
+        raise ConnectionError("Could not fetch wind data from Open-Meteo.")
+    timings['geocoding_and_weather'] = t_done - t_start
+    return wind_data
 
 
 # --- Hoofdfunctie ---
@@ -287,13 +422,9 @@ def find_wind_optimized_loop(start_address: Optional[str] = None,
         coords = weather.get_coords_from_address(start_address)
         if not coords:
             raise ValueError(f"Could not geocode address: {start_address}")
-    if planned_datetime:
-        wind_data = weather.get_forecast_wind_data(coords[0], coords[1], planned_datetime)
-    else:
-        wind_data = weather.get_wind_data(coords[0], coords[1])
-    if not wind_data:
-        raise ConnectionError("Could not fetch wind data from Open-Meteo.")
-    timings['geocoding_and_weather'] = time.perf_counter() - t_start
+    # Wind in de achtergrond; geocoding_and_weather en graph_download_and_prep
+    # overlappen daardoor in de timings
+    wind_future = _io_pool.submit(_fetch_wind, coords[0], coords[1], planned_datetime)
     t_step = time.perf_counter()
 
     # --- Stap 2: Graph ophalen ---
@@ -306,23 +437,26 @@ def find_wind_optimized_loop(start_address: Optional[str] = None,
     if use_prebuilt:
         # --- Pre-built pad: knooppuntgraph uit geheugen, lookups via SQLite ---
         logger.info("Gebruik pre-built graph (radius=%dm)", radius_m)
-        K = graph_mgr.get_knooppunt_subgraph(coords[0], coords[1], radius_m)
+        # Het approach-subgraph hangt enkel van de startcoördinaten af: bouw het
+        # op de achtergrond (SQLite-werk) terwijl hier K wordt voorbereid
+        approach_future = _io_pool.submit(graph_mgr.build_approach_subgraph, coords[0], coords[1], 5000)
+        # Startknooppunt eerst: dan kopieert de subgraph enkel zijn component
+        start_kp_id = graph_mgr.nearest_knooppunt(coords[0], coords[1])
+        K = graph_mgr.get_knooppunt_subgraph(coords[0], coords[1], radius_m, start_kp=start_kp_id)
         if K is None or K.number_of_nodes() < 3:
             raise ValueError("Te weinig knooppunten gevonden in de buurt. Probeer een ander adres of grotere afstand.")
-
-        _add_knooppunt_effort_dynamic(K, graph_mgr, wind_data['speed'], wind_data['direction'])
-
-        # Approach path via klein SQLite subgraph
-        start_kp_id = graph_mgr.nearest_knooppunt(coords[0], coords[1])
         if start_kp_id is None:
             raise ValueError("Geen knooppunten gevonden in de buurt. Probeer een ander adres.")
 
-        # Bouw klein subgraph voor approach path
-        approach_G = graph_mgr.build_approach_subgraph(coords[0], coords[1], radius_m=5000)
+        wind_data = _await_wind(wind_future, t_start, timings)
+        kp_coords = _add_knooppunt_effort_dynamic(K, graph_mgr, wind_data['speed'], wind_data['direction'])
+
+        # Approach path via klein SQLite subgraph (op de achtergrond gebouwd)
+        approach_G = approach_future.result()
         if approach_G and approach_G.number_of_nodes() > 0:
             start_node_id = overpass.nearest_node(approach_G, coords[0], coords[1])
             try:
-                approach_path = nx.shortest_path(approach_G, start_node_id, start_kp_id, weight="length")
+                _, approach_path = nx.bidirectional_dijkstra(approach_G, start_node_id, start_kp_id, weight="length")
                 approach_dist = _sum_path_attr_multidigraph(approach_G, approach_path, "length")
             except (nx.NetworkXNoPath, nx.NodeNotFound):
                 approach_path = [start_kp_id]
@@ -342,19 +476,22 @@ def find_wind_optimized_loop(start_address: Optional[str] = None,
         if G.number_of_nodes() == 0:
             raise ValueError("Geen fietsknooppuntennetwerk gevonden in de buurt. Probeer een ander adres.")
 
+        wind_data = _await_wind(wind_future, t_start, timings)
         add_wind_effort_weight(G, wind_data['speed'], wind_data['direction'])
 
         K = overpass.build_knooppunt_graph(G)
         if K.number_of_nodes() < 3:
             raise ValueError("Te weinig knooppunten gevonden in de buurt. Probeer een ander adres of grotere afstand.")
 
-        _add_knooppunt_effort(K, G)
+        start_node, start_kp_id = overpass.nearest_node_and_knooppunt(G, coords[0], coords[1])
+        _keep_start_component(K, start_kp_id)
 
-        start_node = overpass.nearest_node(G, coords[0], coords[1])
-        start_kp_id = overpass.nearest_knooppunt(G, coords[0], coords[1])
+        _add_knooppunt_effort(K, G)
 
         try:
-            approach_path = nx.shortest_path(G, start_node, start_kp_id, weight="length")
+            # Bidirectioneel: twee zoekfronten die elkaar halverwege treffen
+            # i.p.v. één Dijkstra-cirkel vanaf de start tot aan het knooppunt
+            _, approach_path = nx.bidirectional_dijkstra(G, start_node, start_kp_id, weight="length")
             approach_dist = _sum_path_attr_multidigraph(G, approach_path, "length")
         except nx.NetworkXNoPath:
             approach_path = [start_kp_id]
@@ -377,18 +514,20 @@ def find_wind_optimized_loop(start_address: Optional[str] = None,
     logger.info("DFS max_depth=%d voor %.0fkm route, %d knooppunten",
                 max_depth, distance_km, K.number_of_nodes())
 
+    loop_adj = _loop_adjacency(K, start_kp_id)
     for tol in [tolerance, tolerance + 0.1, tolerance + 0.2]:
-        candidates = _find_knooppunt_loops(K, start_kp_id, loop_target_m, tol, max_depth=max_depth)
+        candidates = _find_knooppunt_loops(K, start_kp_id, loop_target_m, tol,
+                                           max_depth=max_depth, adj_list=loop_adj)
         if candidates:
             break
 
     stats['candidate_loops'] = len(candidates)
 
-    for kp_loop, loop_dist in candidates:
-        score = _score_loop(kp_loop, K, loop_target_m)
-        if score < best_score:
-            best_score = score
-            best_loop = kp_loop
+    if candidates:
+        scores = _score_loops([kp_loop for kp_loop, _ in candidates], K, loop_target_m)
+        best_idx = int(np.argmin(scores))  # eerste minimum, zoals voorheen
+        best_score = float(scores[best_idx])
+        best_loop = candidates[best_idx][0]
 
     timings['loop_finding_algorithm'] = time.perf_counter() - t_step
     t_step = time.perf_counter()
@@ -406,17 +545,20 @@ def find_wind_optimized_loop(start_address: Optional[str] = None,
         full_route = loop_full_path
 
     if use_prebuilt:
-        # Haal coords op uit SQLite voor geometrie
-        all_node_ids = list(set(full_route))
-        node_coords = graph_mgr.get_node_coords(all_node_ids)
+        # Nodes die al in kp_coords liggen (effort-berekening zonder
+        # voorberekende segmenten) niet opnieuw ophalen; de rest uit SQLite
+        node_coords = kp_coords
+        missing = [n for n in set(full_route) if n not in node_coords]
+        if missing:
+            node_coords.update(graph_mgr.get_node_coords(missing))
         route_geometry = _nodes_to_polyline_from_coords(full_route, node_coords)
-        # Bereken afstand via coords
-        actual_distance_m = 0.0
-        for i in range(len(full_route) - 1):
-            c1 = node_coords.get(full_route[i])
-            c2 = node_coords.get(full_route[i + 1])
-            if c1 and c2:
-                actual_distance_m += overpass._haversine(c1[0], c1[1], c2[0], c2[1])
+        # Bereken afstand via coords: één numpy-pass over alle opeenvolgende
+        # paren; paren met een ontbrekende node (NaN) tellen niet mee
+        missing_coord = (np.nan, np.nan)
+        route_coords = np.array([node_coords.get(n, missing_coord) for n in full_route], dtype=float).reshape(-1, 2)
+        seg_lengths = overpass._haversine_np(route_coords[:-1, 0], route_coords[:-1, 1],
+                                             route_coords[1:, 0], route_coords[1:, 1])
+        actual_distance_m = float(np.nansum(seg_lengths))
     else:
         route_geometry = _nodes_to_polyline(G, full_route)
         actual_distance_m = _sum_path_attr_multidigraph(G, full_route, "length")
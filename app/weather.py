@@ -1,11 +1,27 @@
 import logging
+import threading
 import time
 from datetime import datetime, timezone
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional, Tuple, Dict
 
 logger = logging.getLogger(__name__)
 
+# Gedeelde sessie voor Open-Meteo: houdt de TCP/TLS-verbinding open tussen
+# requests (huidige wind + forecast), i.p.v. per call opnieuw te verbinden
+_openmeteo_session = requests.Session()
+_openmeteo_session.mount("https://", HTTPAdapter(pool_maxsize=4))
+
+# Idem voor Nominatim. Hun usage policy staat max. 1 request/seconde toe:
+# calls worden (over alle threads heen) minstens NOMINATIM_MIN_INTERVAL
+# seconden uit elkaar gezet.
+_nominatim_session = requests.Session()
+_nominatim_session.headers["User-Agent"] = "RGWND/2.0 (+contact: dev)"
+_nominatim_lock = threading.Lock()
+_nominatim_last_call = 0.0
+NOMINATIM_MIN_INTERVAL = 1.0
+
 # Simple in-memory TTL caches
 _GEOCODE_CACHE: Dict[str, tuple[float, float]] = {}
 _GEOCODE_TTL: Dict[str, float] = {}
@@ -14,8 +30,12 @@ _WIND_CACHE: Dict[tuple[float, float], dict] = {}
 _WIND_TTL: Dict[tuple[float, float], float] = {}
 
 GEOCODE_TTL_SECONDS = 24 * 3600   # 24u is prima voor adres-coördinaten
+GEOCODE_MISS_TTL_SECONDS = 15 * 60  # "niet gevonden" kort: kan tijdelijk zijn of net toegevoegd in OSM
 WIND_TTL_SECONDS = 10 * 60        # 10 minuten voor actuele wind
 FORECAST_WIND_TTL_SECONDS = 3600  # 1 uur voor voorspelde wind
+# Wind-cache per ~1 km cel (2 decimalen): het Open-Meteo modelgrid is
+# grover, dus nabije startpunten delen één request
+WIND_CACHE_DECIMALS = 2
 
 _FORECAST_WIND_CACHE: Dict[tuple, dict] = {}
 _FORECAST_WIND_TTL: Dict[tuple, float] = {}
@@ -23,6 +43,16 @@ _FORECAST_WIND_TTL: Dict[tuple, float] = {}
 def _now() -> float:
     return time.time()
 
+def _nominatim_get(url: str, params: dict) -> requests.Response:
+    """GET naar Nominatim via de gedeelde sessie, gespreid volgens de rate limit."""
+    global _nominatim_last_call
+    with _nominatim_lock:
+        wait = _nominatim_last_call + NOMINATIM_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _nominatim_last_call = time.monotonic()
+    return _nominatim_session.get(url, params=params, timeout=10)
+
 def get_coords_from_address(address: str) -> Optional[tuple[float, float]]:
     """
     Geocodes an address in Belgium to latitude and longitude using the Nominatim API.
@@ -40,15 +70,12 @@ def get_coords_from_address(address: str) -> Optional[tuple[float, float]]:
         "countrycodes": "be",
         "limit": 1
     }
-    headers = {
-        "User-Agent": "RGWND/2.0 (+contact: dev)"
-    }
     from .notify import send_alert
     max_retries = 2
 
     for attempt in range(max_retries + 1):
         try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            response = _nominatim_get(url, params)
             if response.status_code in (429, 503, 504) and attempt < max_retries:
                 logger.warning("Nominatim HTTP %d, poging %d/%d", response.status_code, attempt + 1, max_retries + 1)
                 time.sleep(2 ** attempt)
@@ -60,6 +87,10 @@ def get_coords_from_address(address: str) -> Optional[tuple[float, float]]:
                 _GEOCODE_CACHE[key] = coords
                 _GEOCODE_TTL[key] = _now() + GEOCODE_TTL_SECONDS
                 return coords
+            # Ook "niet gevonden" cachen, maar kort: snelle herhalingen van
+            # hetzelfde adres kosten zo geen (rate-limited) Nominatim-call
+            _GEOCODE_CACHE.pop(key, None)
+            _GEOCODE_TTL[key] = _now() + GEOCODE_MISS_TTL_SECONDS
             return None
         except (requests.Timeout, requests.ConnectionError) as e:
             if attempt < max_retries:
@@ -80,15 +111,17 @@ def get_wind_data(lat: float, lon: float) -> Optional[dict]:
     Fetches current wind data from the Open-Meteo API.
     Cached for 10 minutes.
     """
-    loc = (round(lat, 4), round(lon, 4))  # round to improve cache hit rate
+    loc = (round(lat, WIND_CACHE_DECIMALS), round(lon, WIND_CACHE_DECIMALS))  # round to improve cache hit rate
     ts = _WIND_TTL.get(loc)
     if ts and _now() < ts:
         return _WIND_CACHE.get(loc)
 
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        # Query the cell itself, so a cached entry never depends on which
+        # point in the cell happened to be requested first
+        "latitude": loc[0],
+        "longitude": loc[1],
         "current": "wind_speed_10m,wind_direction_10m",
         "wind_speed_unit": "ms",
     }
@@ -97,7 +130,7 @@ def get_wind_data(lat: float, lon: float) -> Optional[dict]:
 
     for attempt in range(max_retries + 1):
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = _openmeteo_session.get(url, params=params, timeout=10)
             if response.status_code in (429, 503, 504) and attempt < max_retries:
                 logger.warning("Open-Meteo HTTP %d, poging %d/%d", response.status_code, attempt + 1, max_retries + 1)
                 time.sleep(2 ** attempt)
@@ -131,7 +164,7 @@ def get_forecast_wind_data(lat: float, lon: float, target_dt: datetime) -> Optio
     Fetches forecasted wind data for a specific future hour from Open-Meteo.
     Uses hourly forecast endpoint. Cached for 1 hour.
     """
-    loc = (round(lat, 4), round(lon, 4))
+    loc = (round(lat, WIND_CACHE_DECIMALS), round(lon, WIND_CACHE_DECIMALS))
     # Round to nearest hour for cache key
     target_hour = target_dt.replace(minute=0, second=0, microsecond=0)
     cache_key = (loc[0], loc[1], target_hour.isoformat())
@@ -148,8 +181,8 @@ def get_forecast_wind_data(lat: float, lon: float, target_dt: datetime) -> Optio
 
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        "latitude": loc[0],
+        "longitude": loc[1],
         "hourly": "wind_speed_10m,wind_direction_10m",
         "wind_speed_unit": "ms",
         "forecast_days": forecast_days,
@@ -160,7 +193,7 @@ def get_forecast_wind_data(lat: float, lon: float, target_dt: datetime) -> Optio
 
     for attempt in range(max_retries + 1):
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = _openmeteo_session.get(url, params=params, timeout=10)
             if response.status_code in (429, 503, 504) and attempt < max_retries:
                 logger.warning("Open-Meteo forecast HTTP %d, poging %d/%d", response.status_code, attempt + 1, max_retries + 1)
                 time.sleep(2 ** attempt)
@@ -1,14 +1,17 @@
 """Shared wind utility functions."""
 
-CARDINAL_DIRS = [
+import math
+
+CARDINAL_DIRS = (
     "N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
     "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW",
-]
+)
 
 
 def degrees_to_cardinal(deg: float) -> str:
-    ix = round(deg / (360 / len(CARDINAL_DIRS)))
-    return CARDINAL_DIRS[ix % len(CARDINAL_DIRS)]
+    # 16 sectors of 22.5°: round to the nearest sector, wrap with a bitmask
+    # (16 is a power of two, so & 15 is the modulo, also for negative angles)
+    return CARDINAL_DIRS[math.floor(deg / 22.5 + 0.5) & 15]
 
 
 def wind_arrow_rotation(direction_deg: float) -> float:
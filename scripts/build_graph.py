@@ -19,8 +19,11 @@ import pickle
 import sqlite3
 import tempfile
 import time
+from array import array
 from pathlib import Path
 
+import numpy as np
+
 logging.basicConfig(
     format="%(asctime)s %(levelname)s %(name)s %(message)s",
     level=logging.INFO,
@@ -30,6 +33,29 @@ logger = logging.getLogger(__name__)
 GRAPH_DIR = Path(os.environ.get("GRAPH_DATA_DIR", "./graph_data"))
 
 
+def _tune_connection(conn: sqlite3.Connection) -> None:
+    """
+    Bulk-load PRAGMAs voor de build-database.
+
+    Moet vóór het aanmaken van tabellen draaien (page_size werkt enkel op een
+    lege database). De database wordt bij elke build volledig opnieuw
+    opgebouwd, dus synchronous=NORMAL is veilig. De build is de enige writer:
+    locking_mode=EXCLUSIVE houdt de lock vast (geen lock/unlock per statement,
+    geen shared-memory WAL-index) en checkpoints gebeuren zelden. De page
+    cache is ruim (256 MB): de R-tree en de B-trees blijven tijdens de bulk
+    load in geheugen i.p.v. pagina's te moeten terugschrijven en herlezen.
+    """
+    conn.executescript("""
+        PRAGMA page_size=8192;
+        PRAGMA locking_mode=EXCLUSIVE;
+        PRAGMA journal_mode=WAL;
+        PRAGMA wal_autocheckpoint=10000;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-262144;
+    """)
+
+
 def _build_sqlite(G, db_path: Path) -> None:
     """Schrijf alle nodes + edges uit de volledige graph naar SQLite."""
     # Schrijf naar temp bestand, dan atomic rename
@@ -38,9 +64,10 @@ def _build_sqlite(G, db_path: Path) -> None:
 
     try:
         conn = sqlite3.connect(tmp_path)
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
+        _tune_connection(conn)
 
+        # edges zonder rowid: de tabel ís de primary-key B-tree, i.p.v. een
+        # rowid-tabel plus een aparte autoindex op (source_id, target_id)
         conn.executescript("""
             CREATE TABLE nodes (
                 id INTEGER PRIMARY KEY,
@@ -59,38 +86,57 @@ def _build_sqlite(G, db_path: Path) -> None:
                 length REAL NOT NULL,
                 bearing REAL NOT NULL,
                 PRIMARY KEY (source_id, target_id)
-            );
-            CREATE INDEX idx_edges_source ON edges(source_id);
+            ) WITHOUT ROWID;
         """)
 
-        # Nodes
-        node_rows = []
-        rtree_rows = []
-        for nid, data in G.nodes(data=True):
-            lat = data["y"]
-            lon = data["x"]
-            rcn_ref = data.get("rcn_ref")
-            node_rows.append((nid, lat, lon, rcn_ref))
-            rtree_rows.append((nid, lat, lat, lon, lon))
-
-        conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?)", node_rows)
-        conn.executemany("INSERT INTO nodes_rtree VALUES (?, ?, ?, ?, ?)", rtree_rows)
-        logger.info("SQLite: %d nodes geschreven", len(node_rows))
-
-        # Edges — deduplicate (MultiDiGraph kan meerdere edges per paar hebben)
-        edge_dict = {}
-        for u, v, data in G.edges(data=True):
-            key = (u, v)
-            if key not in edge_dict:
-                edge_dict[key] = (u, v, data.get("length", 0.0), data.get("bearing", 0.0))
-
-        conn.executemany(
-            "INSERT OR IGNORE INTO edges VALUES (?, ?, ?, ?)",
-            edge_dict.values(),
-        )
-        logger.info("SQLite: %d edges geschreven", len(edge_dict))
-
-        conn.commit()
+        # Rijen worden rechtstreeks vanuit G gegenereerd en gestreamd naar
+        # executemany: geen lijsten van alle node- en edge-tuples in geheugen.
+        # Gesorteerd op primary key: inserts worden appends aan de rechterkant
+        # van de B-tree i.p.v. willekeurige page-splits.
+        node_ids = sorted(G.nodes)
+        nodes = G.nodes
+
+        def node_rows():
+            for nid in node_ids:
+                data = nodes[nid]
+                yield nid, data["y"], data["x"], data.get("rcn_ref")
+
+        # Edges — per (u, v) enkel de eerste edge (MultiDiGraph kan meerdere
+        # edges per paar hebben), dus geen OR IGNORE-probe per rij nodig
+        adj = G.adj
+
+        def edge_rows():
+            for u in node_ids:
+                nbrs = adj[u]
+                for v in sorted(nbrs):
+                    data = next(iter(nbrs[v].values()))
+                    yield u, v, data.get("length", 0.0), data.get("bearing", 0.0)
+
+        # Alle inserts in één expliciete transactie: één commit/fsync voor de
+        # hele bulk load, en rollback als er onderweg iets misloopt
+        conn.execute("BEGIN")
+        try:
+            n_nodes = conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?)", node_rows()).rowcount
+            # R-tree in één statement uit de net geschreven nodes-tabel (in
+            # id-volgorde): geen tweede Python-pass en geen parameter-binding
+            # per rij
+            conn.execute("""
+                INSERT INTO nodes_rtree (id, min_lat, max_lat, min_lon, max_lon)
+                SELECT id, lat, lat, lon, lon FROM nodes
+            """)
+            # Geen aparte index op source_id: de primary key (source_id,
+            # target_id) heeft source_id als linker prefix en dekt die lookups al
+            n_edges = conn.executemany("INSERT INTO edges VALUES (?, ?, ?, ?)", edge_rows()).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.close()
+            raise
+        logger.info("SQLite: %d nodes geschreven", n_nodes)
+        logger.info("SQLite: %d edges geschreven", n_edges)
+
+        # WAL terugschrijven naar het hoofdbestand vóór de rename
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
         conn.close()
 
         # Atomic rename
@@ -106,6 +152,35 @@ def _build_sqlite(G, db_path: Path) -> None:
         raise
 
 
+def _add_segment_geometry(K, G) -> None:
+    """
+    Sla per knooppunt-edge de lengte en bearing van elk segment van full_path
+    op (seg_length / seg_bearing, compacte float64-arrays in padrichting).
+    Zo hoeft de wind-effort per request geen coords uit SQLite op te halen en
+    geen haversine/bearing opnieuw te berekenen: enkel nog één numpy-expressie.
+    """
+    from app import overpass
+
+    edge_data = [data for _, _, data in K.edges(data=True)]
+    path_lens = np.fromiter((len(d["full_path"]) for d in edge_data), dtype=np.int64, count=len(edge_data))
+    flat_ids = np.frombuffer(b"".join(d["full_path"].tobytes() for d in edge_data), dtype=np.int64)
+    nodes = G.nodes
+    lats = np.fromiter((nodes[n]["y"] for n in flat_ids.tolist()), dtype=float, count=len(flat_ids))
+    lons = np.fromiter((nodes[n]["x"] for n in flat_ids.tolist()), dtype=float, count=len(flat_ids))
+
+    # Segment i loopt van node i naar i+1, behalve op de laatste node van elk pad
+    is_seg_start = np.ones(len(flat_ids), dtype=bool)
+    is_seg_start[np.cumsum(path_lens) - 1] = False
+    seg_from = np.flatnonzero(is_seg_start)
+    lengths, bearings = overpass._length_bearing_np(lats[seg_from], lons[seg_from],
+                                                     lats[seg_from + 1], lons[seg_from + 1])
+
+    split_at = np.cumsum(path_lens - 1)[:-1]
+    for data, seg_length, seg_bearing in zip(edge_data, np.split(lengths, split_at), np.split(bearings, split_at)):
+        data["seg_length"] = array("d", seg_length.tobytes())
+        data["seg_bearing"] = array("d", seg_bearing.tobytes())
+
+
 def _build_pickle(K, pickle_path: Path) -> None:
     """Serialiseer knooppuntgraph naar pickle (atomic write)."""
     fd, tmp_path = tempfile.mkstemp(suffix=".pickle", dir=pickle_path.parent)
@@ -152,11 +227,15 @@ def build():
     # Stap 3: Gecondenseerde knooppuntgraph
     logger.info("=== Stap 3: Knooppuntgraph bouwen ===")
     t2 = time.perf_counter()
-    K = overpass.build_knooppunt_graph(G)
+    # Per-knooppunt zoektochten zijn onafhankelijk: spreid over alle cores
+    K = overpass.build_knooppunt_graph(G, workers=os.cpu_count() or 1)
     t_knooppunt = time.perf_counter() - t2
     logger.info("Knooppuntgraph: %d knooppunten, %d edges (%.1fs)",
                 K.number_of_nodes(), K.number_of_edges(), t_knooppunt)
 
+    # Segmentgeometrie voor de wind-effort per request (uit G, vóór die weg is)
+    _add_segment_geometry(K, G)
+
     # Stap 4: SQLite schrijven
     logger.info("=== Stap 4: SQLite schrijven ===")
     t3 = time.perf_counter()